@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloolast.settings')
 
 application = get_asgi_application()
+
+from core.warmup import warm_on_start  # noqa: E402  (needs the app registry)
+
+# Does nothing when a server imports this inside its event loop (plain
+# uvicorn); gunicorn --preload imports it in the master before any loop
+warm_on_start()
@@ -0,0 +1,76 @@
+"""
+DATABASES["default"] built from the environment.
+
+Connections are kept open between requests (DB_CONN_MAX_AGE seconds) and
+checked before reuse, so a restarted database server costs one failed
+ping instead of a 500. On Postgres DB_POOL=1 switches to psycopg 3's
+connection pool instead (needs ``psycopg[pool]``). SQLite gets WAL and
+a busy timeout so concurrent question submissions wait for the writer
+rather than failing with "database is locked".
+"""
+import os
+
+from .env import get_bool
+
+SQLITE_ENGINE = "django.db.backends.sqlite3"
+POSTGRES_ENGINE = "django.db.backends.postgresql"
+
+SQLITE_PRAGMAS = (
+    # Readers never block the writer and vice versa
+    "PRAGMA journal_mode=WAL",
+    # Safe with WAL; only the last transactions can be lost on power loss
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=134217728",
+)
+
+
+def sqlite_database(base_dir):
+    options = {
+        # Seconds to wait on a lock, also applied as PRAGMA busy_timeout
+        "timeout": float(os.getenv("DB_SQLITE_TIMEOUT", "20")),
+        # Take the write lock when the transaction starts; a deferred
+        # transaction that upgrades later fails at once without waiting
+        "transaction_mode": "IMMEDIATE",
+    }
+    if get_bool("DB_SQLITE_PRAGMAS", True):
+        options["init_command"] = ";".join(SQLITE_PRAGMAS)
+    return {
+        "ENGINE": SQLITE_ENGINE,
+        "NAME": os.getenv("DB_NAME", base_dir / "db.sqlite3"),
+        "OPTIONS": options,
+    }
+
+
+def server_database(engine):
+    database = {
+        "ENGINE": engine,
+        "NAME": os.getenv("DB_NAME", ""),
+        "USER": os.getenv("DB_USER", ""),
+        "PASSWORD": os.getenv("DB_PASSWORD", ""),
+        "HOST": os.getenv("DB_HOST", ""),
+        "PORT": os.getenv("DB_PORT", ""),
+        "OPTIONS": {},
+    }
+    if engine == POSTGRES_ENGINE and get_bool("DB_POOL"):
+        database["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    return database
+
+
+def database_settings(base_dir):
+    engine = os.getenv("DB_ENGINE", SQLITE_ENGINE)
+    if engine == SQLITE_ENGINE:
+        database = sqlite_database(base_dir)
+    else:
+        database = server_database(engine)
+    if database["OPTIONS"].get("pool"):
+        # The pool owns connection lifetime; Django refuses CONN_MAX_AGE with it
+        database["CONN_MAX_AGE"] = 0
+    else:
+        database["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+        database["CONN_HEALTH_CHECKS"] = True
+    return {"default": database}
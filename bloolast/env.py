@@ -0,0 +1,9 @@
+"""Environment variable helpers shared by settings.py and database.py"""
+import os
+
+
+def get_bool(name: str, default: bool = False) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.lower() in {"1", "true", "yes", "on"}
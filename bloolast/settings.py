@@ -1,13 +1,10 @@
 from pathlib import Path
 import os
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+from .database import database_settings
+from .env import get_bool
 
-def get_bool(name: str, default: bool = False) -> bool:
-    v = os.getenv(name)
-    if v is None:
-        return default
-    return v.lower() in {"1", "true", "yes", "on"}
+BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "WRITE YOUR SECRET KEY")
 DEBUG = get_bool("DJANGO_DEBUG", False)
@@ -27,54 +24,63 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.StaticPagesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.NotModifiedMiddleware",
     "core.middleware.GlobalRateLimitMiddleware",
 ]
 
 ROOT_URLCONF = "bloolast.urls"
 TEMPLATES = [{
-    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "BACKEND": "core.template_backend.DjangoTemplates",
     "DIRS": [BASE_DIR / "templates"],
-    "APP_DIRS": True,
-    "OPTIONS": {"context_processors": [
-        "django.template.context_processors.debug",
-        "django.template.context_processors.request",
-        "django.contrib.auth.context_processors.auth",
-        "django.contrib.messages.context_processors.messages",
-    ]},
+    "OPTIONS": {
+        "context_processors": [
+            "django.template.context_processors.debug",
+            "django.template.context_processors.request",
+            "django.contrib.auth.context_processors.auth",
+            "django.contrib.messages.context_processors.messages",
+        ],
+        # Compile each template once per process instead of on every render
+        "loaders": [("django.template.loaders.cached.Loader", [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ])],
+    },
 }]
 WSGI_APPLICATION = "bloolast.wsgi.application"
 ASGI_APPLICATION = "bloolast.asgi.application"
 
-DB_ENGINE = os.getenv("DB_ENGINE", "django.db.backends.sqlite3")
-if DB_ENGINE == "django.db.backends.sqlite3":
-    DATABASES = {"default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.getenv("DB_NAME", BASE_DIR / "db.sqlite3"),
-    }}
-else:
-    DATABASES = {"default": {
-        "ENGINE": DB_ENGINE,
-        "NAME": os.getenv("DB_NAME", ""),
-        "USER": os.getenv("DB_USER", ""),
-        "PASSWORD": os.getenv("DB_PASSWORD", ""),
-        "HOST": os.getenv("DB_HOST", ""),
-        "PORT": os.getenv("DB_PORT", ""),
-    }}
-
-# Cache (per-process; for shared limits across workers, use Redis)
+# Engine, persistent connections, Postgres pooling and SQLite pragmas
+# are all env-driven; see bloolast/database.py
+DATABASES = database_settings(BASE_DIR)
+
+# Cache (per-process by default; point CACHE_BACKEND at Redis/Memcached so
+# mentor page invalidation reaches every worker immediately)
 CACHES = {"default": {
-    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    "LOCATION": "bloo-cache",
+    "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+    "LOCATION": os.getenv("CACHE_LOCATION", "bloo-cache"),
     "TIMEOUT": 60,
 }}
+# Cache-Control per kind of public page (core.http_cache.cache_profile), for
+# browsers and a CDN/reverse proxy in front of us. Mentor pages carry an ETag,
+# so once stale they revalidate with a cheap 304.
+CACHE_PROFILES = {
+    "mentor-pages": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+    "static-pages": "public, max-age=3600, stale-while-revalidate=86400",
+}
+# Lifetime of cached mentor pages/fragments, and the most a per-process
+# cache can lag behind a Mentor/MentorPage edit made in another worker
+MENTOR_CACHE_TIMEOUT = int(os.getenv("MENTOR_CACHE_TIMEOUT", "300"))
+# How stale the question totals above the admin question list may get
+STATUS_TOTALS_CACHE_SECONDS = int(os.getenv("STATUS_TOTALS_CACHE_SECONDS", "60"))
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -91,6 +97,26 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATIC_ROOT = os.getenv("STATIC_ROOT", str(BASE_DIR / "staticfiles"))
 STATICFILES_DIRS = [BASE_DIR / "static"] if (BASE_DIR / "static").exists() else []
+# collectstatic builds the bundles, adds content hashes and gzip/brotli copies
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.storage.BundledStaticFilesStorage"},
+}
+# Per-page bundles for {% bundle %} (core/templatetags/assets.py), sources in load order
+STATIC_BUNDLES = {
+    "bundles/home.css": ["css/home.css"],
+    "bundles/home.js": ["js/particles.js", "js/app.js", "js/home.js"],
+    "bundles/mentor_list.css": ["css/mentor_list.css"],
+    "bundles/mentor_list.js": ["js/mentor_list.js"],
+    "bundles/coming_soon.js": ["js/countdown.js"],
+}
+
+# Pages written by `manage.py prerender_pages`, served by WhiteNoise at the site root;
+# run it after collectstatic so the pages link the hashed bundles
+PRERENDER_ROOT = os.getenv("PRERENDER_ROOT", str(BASE_DIR / "prerendered"))
+PRERENDER_MAX_AGE = int(os.getenv("PRERENDER_MAX_AGE", str(60 * 60)))
+WHITENOISE_ROOT = PRERENDER_ROOT if Path(PRERENDER_ROOT).exists() else None
+WHITENOISE_INDEX_FILE = True
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))
@@ -117,8 +143,66 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "info@bloo.az")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "ncqfwexjltrvzbtu")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "Bloo <info@bloo.az>")
 EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
+ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "info@bloo.az")
+# Outbox drained by `manage.py send_queued_email --loop`
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_RETRY_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_SECONDS", "60"))
+# 0 sends the admin one email per question; N > 0 leaves them for
+# `manage.py send_question_digest --loop`, which mails a list every N minutes
+QUESTION_DIGEST_MINUTES = int(os.getenv("QUESTION_DIGEST_MINUTES", "0"))
+# Absolute base for links in emails sent outside a request
+SITE_URL = os.getenv("SITE_URL", "https://bloo.az")
+# How long the answer/inbox links in mentor emails keep working
+MENTOR_TOKEN_MAX_AGE = int(os.getenv("MENTOR_TOKEN_MAX_AGE", str(14 * 24 * 60 * 60)))
+
+# Prometheus metrics of this process; scrape with the token, or from an allowed address
+METRICS_PATH = "/metrics"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+SERVER_TIMING = get_bool("SERVER_TIMING", True)
 
 # App-layer throttling
 RATE_LIMIT_DEFAULT = int(os.getenv("RATE_LIMIT_DEFAULT", "100"))
 RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
-
+# Counters must be shared by all workers: SQLiteBackend for a single host,
+# RedisBackend (RATE_LIMIT_LOCATION=redis://...) for several. SketchBackend
+# keeps fixed-size per-process counters, for a single-worker deployment.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "core.ratelimit.SQLiteBackend")
+RATE_LIMIT_LOCATION = os.getenv("RATE_LIMIT_LOCATION", str(BASE_DIR / "ratelimit.sqlite3"))
+# Proxies (CIDRs) whose X-Forwarded-For is believed, e.g. "10.0.0.0/8,127.0.0.1";
+# with none, the client is always REMOTE_ADDR
+RATE_LIMIT_TRUSTED_PROXIES = [
+    cidr.strip() for cidr in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if cidr.strip()
+]
+# IPv6 clients are counted per network of this size
+RATE_LIMIT_IPV6_PREFIX = int(os.getenv("RATE_LIMIT_IPV6_PREFIX", "64"))
+# First matching path prefix (and method, if given) wins; RATE_LIMIT_DEFAULT covers the rest
+RATE_LIMIT_POLICIES = [
+    {"name": "ask-question", "path": "/mentors/ask-question/", "methods": ["POST"], "limit": 10, "window": 600},
+    {"name": "mentor-list", "path": "/mentors/", "limit": 120, "window": 60},
+]
+# Saved questions per client IP / asker email, on top of the policies above
+QUESTION_QUOTAS = [
+    {"key": "ip", "limit": 5, "window": 60 * 60},
+    {"key": "ip", "limit": 20, "window": 24 * 60 * 60},
+    {"key": "email", "limit": 3, "window": 60 * 60},
+]
+# Identical resubmissions inside this many seconds are dropped
+QUESTION_DUPLICATE_WINDOW = int(os.getenv("QUESTION_DUPLICATE_WINDOW", str(24 * 60 * 60)))
+
+# Open (assigned, unanswered) questions a mentor may hold before
+# `manage.py auto_assign` stops routing new ones to them; 0 means no cap
+ASSIGNMENT_MAX_OPEN = int(os.getenv("ASSIGNMENT_MAX_OPEN", "10"))
+# Sent/rejected questions older than this move to the archive table with
+# `manage.py archive_questions`
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+# Previously answered questions shown next to a question in the admin;
+# the index behind them is kept current by `manage.py index_answers`
+SIMILAR_ANSWERS_COUNT = int(os.getenv("SIMILAR_ANSWERS_COUNT", "5"))
+
+# Compile templates, load URLconfs and render these pages when the WSGI/ASGI
+# application is imported; with `gunicorn --preload` that happens once in
+# the master and forked workers inherit the result (see core.warmup)
+WARMUP_ON_START = get_bool("WARMUP_ON_START", True)
+WARMUP_PATHS = ["/", "/mentors/", "/mentors/ask-question/"]
@@ -7,7 +7,10 @@ from django.views.generic import RedirectView
 urlpatterns = [
     path("", include("core.urls")),         
     path("mentors/", include("mentors.urls")),
+    path("admin/", admin.site.urls),
 ]
 
+handler404 = "core.views.handler404"
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
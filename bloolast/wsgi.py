@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloolast.settings')
 
 application = get_wsgi_application()
+
+from core.warmup import warm_on_start  # noqa: E402  (needs the app registry)
+
+warm_on_start()
@@ -0,0 +1,67 @@
+"""
+Per-page JS/CSS bundles, built by collectstatic through
+core.storage.BundledStaticFilesStorage.
+
+STATIC_BUNDLES maps a bundle path to the static files it concatenates,
+in order. Bundles are minified with ``rjsmin``/``rcssmin`` when those
+packages are installed. Without rcssmin a built-in pass drops CSS comments
+and whitespace. Without rjsmin, JS ships as written: telling comments
+from "//" in strings, regexes and template literals takes a real parser.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    import rjsmin
+except ImportError:  # optional
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:  # optional
+    rcssmin = None
+
+_CSS_STRING_RE = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')')
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE_RE = re.compile(r"\s+")
+# Spaces around these never matter. Only the space after ":" goes, since
+# "a :hover" and "a:hover" are different selectors
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*|(:)\s+")
+
+
+def bundles():
+    return getattr(settings, "STATIC_BUNDLES", {})
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    parts = _CSS_STRING_RE.split(text)
+    for i in range(0, len(parts), 2):  # even items are outside strings
+        code = _CSS_COMMENT_RE.sub("", parts[i])
+        code = _CSS_SPACE_RE.sub(" ", code)
+        parts[i] = _CSS_PUNCT_RE.sub(lambda m: m.group(1) or m.group(2), code).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+def build_bundle(name, sources):
+    """Concatenate and minify the source files of one bundle"""
+    minify = minify_css if name.endswith(".css") else minify_js
+    chunks = []
+    for source in sources:
+        path = finders.find(source)
+        if path is None:
+            raise ValueError(f"Static bundle {name!r} lists missing file {source!r}.")
+        with open(path, encoding="utf-8") as fh:
+            chunks.append(minify(fh.read()))
+    # ";" keeps one script's last statement from running into the next
+    separator = "\n" if name.endswith(".css") else ";\n"
+    return separator.join(chunks) + "\n"
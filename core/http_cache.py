@@ -0,0 +1,80 @@
+"""
+Cache-Control profiles and conditional GET for the public views.
+
+``@cache_profile(name, etag=..., last_modified=..., vary=...)`` gives a
+view the CACHE_PROFILES[name] Cache-Control header, its Vary headers and
+ETag/Last-Modified validators. Validators are async functions of the view
+arguments that read a cached version stamp rather than the database, so
+core.middleware.NotModifiedMiddleware can answer a matching revalidation
+with a 304 before the rate limiter or the view runs.
+"""
+from functools import wraps
+from typing import Callable, NamedTuple, Optional
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class CacheProfile(NamedTuple):
+    name: str
+    etag: Optional[Callable] = None
+    last_modified: Optional[Callable] = None
+    vary: tuple = ()
+
+    @property
+    def conditional(self):
+        return self.etag is not None or self.last_modified is not None
+
+    async def check(self, request, *args, **kwargs):
+        """(304/412 response or None, ETag, Last-Modified timestamp) for the request"""
+        etag = last_modified = None
+        if self.etag:
+            etag = quote_etag(await self.etag(request, *args, **kwargs))
+        if self.last_modified:
+            moment = await self.last_modified(request, *args, **kwargs)
+            last_modified = int(moment.timestamp()) if moment else None
+        return get_conditional_response(request, etag=etag, last_modified=last_modified), etag, last_modified
+
+    def finish(self, request, response, etag=None, last_modified=None):
+        if request.method in ("GET", "HEAD"):
+            if last_modified and not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault("ETag", etag)
+        if self.vary:
+            patch_vary_headers(response, self.vary)
+        # Errors and responses setting cookies must not land in a shared cache
+        if response.status_code in (200, 304) and not response.cookies:
+            response.headers.setdefault("Cache-Control", settings.CACHE_PROFILES[self.name])
+        return response
+
+
+def cache_profile(name, etag=None, last_modified=None, vary=()):
+    profile = CacheProfile(name, etag, last_modified, tuple(vary))
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                response = etag_value = modified = None
+                if profile.conditional:
+                    response, etag_value, modified = await profile.check(request, *args, **kwargs)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return profile.finish(request, response, etag_value, modified)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                response = etag_value = modified = None
+                if profile.conditional:
+                    response, etag_value, modified = async_to_sync(profile.check)(request, *args, **kwargs)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return profile.finish(request, response, etag_value, modified)
+
+        wrapper.cache_profile = profile
+        return wrapper
+
+    return decorator
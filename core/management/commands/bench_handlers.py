@@ -0,0 +1,128 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+XHR = {'X-Requested-With': 'XMLHttpRequest'}
+
+
+def client_ip(i):
+    # A fresh address per request keeps the rate limiter from answering 429
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+class Command(BaseCommand):
+    help = "Load-test the public pages in-process through the WSGI and the ASGI handler"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per page and handler")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        self.host = options['host']
+        with override_settings(ALLOWED_HOSTS=[self.host]):
+            self._bench(options)
+
+    def _bench(self, options):
+        total, concurrency = options['requests'], options['concurrency']
+        pages = [
+            ('home', reverse('home'), '', {}),
+            ('mentor list', reverse('mentor_list'), '', {}),
+            ('mentor page', reverse('mentor_list'), 'page_size=12', XHR),
+            ('search', reverse('mentor_list'), 'q=ada', XHR),
+            ('ask form', reverse('ask_question'), '', {}),
+        ]
+        wsgi, asgi = WSGIHandler(), ASGIHandler()
+
+        self.stdout.write(f"{total} requests per page, concurrency {concurrency}")
+        self.stdout.write(f"{'page':<14}{'handler':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, path, query, headers in pages:
+            for label, run in (('wsgi', self._run_wsgi), ('asgi', self._run_asgi)):
+                app = wsgi if label == 'wsgi' else asgi
+                run(app, path, query, headers, 1, 1)  # warm caches and connections
+                elapsed, latencies, errors = run(app, path, query, headers, total, concurrency)
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f"{name:<14}{label:>8}{total / elapsed:>10.0f}"
+                    f"{statistics.median(latencies) * 1000:>10.2f}{p99 * 1000:>10.2f}{errors:>8}"
+                )
+
+    def _run_wsgi(self, app, path, query, headers, total, concurrency):
+        def one(i):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SERVER_NAME': self.host, 'SERVER_PORT': '443', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': self.host, 'REMOTE_ADDR': client_ip(i),
+                'wsgi.url_scheme': 'https', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            for header, value in headers.items():
+                environ['HTTP_' + header.upper().replace('-', '_')] = value
+            status = []
+            start = time.perf_counter()
+            response = app(environ, lambda s, h, exc_info=None: status.append(int(s.split()[0])))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return time.perf_counter() - start, status[0]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        return self._summarise(time.perf_counter() - start, results)
+
+    def _run_asgi(self, app, path, query, headers, total, concurrency):
+        async def one(i, limit):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'https', 'path': path, 'raw_path': path.encode(),
+                'query_string': query.encode(), 'root_path': '',
+                'headers': [(b'host', self.host.encode())] + [
+                    (header.lower().encode(), value.encode()) for header, value in headers.items()
+                ],
+                'client': (client_ip(i), 50000), 'server': (self.host, 443),
+            }
+            body_sent = asyncio.Event()
+            status = []
+
+            async def receive():
+                if not body_sent.is_set():
+                    body_sent.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The handler listens for a disconnect until the response is done
+                await asyncio.Future()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with limit:
+                start = time.perf_counter()
+                await app(scope, receive, send)
+                return time.perf_counter() - start, status[0]
+
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(i, limit) for i in range(total)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        return self._summarise(time.perf_counter() - start, results)
+
+    def _summarise(self, elapsed, results):
+        latencies = [latency for latency, _ in results]
+        errors = sum(1 for _, status in results if status >= 400)
+        return elapsed, latencies, errors
@@ -0,0 +1,73 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# "import time:       self [us] |   cumulative | imported package"
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+STARTUP = "import django; django.setup(); import {module}"
+
+
+def parse_importtime(text):
+    """[(module, self µs, cumulative µs, depth)] from `python -X importtime` stderr"""
+    rows = []
+    for line in text.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((module, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile worker start-up: `python -X importtime` of the application, then the warm-up steps"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default=settings.WSGI_APPLICATION.rpartition('.')[0],
+                            help="Module a worker imports (default: the WSGI_APPLICATION module)")
+        parser.add_argument('--top', type=int, default=20, help="Modules to list")
+        parser.add_argument('--no-warmup', action='store_true', help="Skip timing the warm-up steps")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'bloolast.settings'))
+        # Imports only; the warm-up is timed separately below
+        env['WARMUP_ON_START'] = '0'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP.format(module=options['module'])],
+            env=env, capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        rows = parse_importtime(result.stderr)
+        if result.returncode or not rows:
+            self.stderr.write(result.stderr[-2000:])
+            return
+
+        total = sum(own for _, own, _, _ in rows)
+        self.stdout.write(f"{len(rows)} modules imported in {total / 1000:.1f} ms")
+
+        packages = defaultdict(int)
+        for module, own, _, _ in rows:
+            packages[module.partition('.')[0]] += own
+        self._table("By top-level package (self time)", sorted(packages.items(), key=lambda item: -item[1]),
+                    options['top'], total)
+        # Only the imports made directly by start-up, so nested ones aren't counted twice
+        self._table("Slowest top-level imports (cumulative)",
+                    sorted(((module, cumulative) for module, _, cumulative, depth in rows if depth == 0),
+                           key=lambda item: -item[1]),
+                    options['top'], total)
+
+        if not options['no_warmup']:
+            from core.warmup import warm
+            timings = warm()
+            self.stdout.write("\nWarm-up steps")
+            for step, seconds in timings.items():
+                self.stdout.write(f"  {step:<12}{seconds * 1000:>10.1f} ms")
+
+    def _table(self, title, items, top, total):
+        self.stdout.write(f"\n{title}")
+        for name, micros in items[:top]:
+            self.stdout.write(f"  {name:<50}{micros / 1000:>10.1f} ms{micros / total:>8.0%}")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.prerender import build
+
+
+class Command(BaseCommand):
+    help = "Render the static public pages to PRERENDER_ROOT with gzip/brotli variants for WhiteNoise"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help="Output directory (defaults to PRERENDER_ROOT)")
+
+    def handle(self, *args, **options):
+        written = build(options['root'], log=self.stdout.write)
+        for path in written:
+            self.stdout.write(f"  {path}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(written)} files."))
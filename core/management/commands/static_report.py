@@ -0,0 +1,47 @@
+import gzip
+import posixpath
+from collections import defaultdict
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from core import assets
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = "Bytes and requests per page for the STATIC_BUNDLES, as sources and as built bundles"
+
+    def handle(self, *args, **options):
+        pages = defaultdict(lambda: defaultdict(int))
+        for name, sources in assets.bundles().items():
+            page = pages[posixpath.splitext(posixpath.basename(name))[0]]
+            for source in sources:
+                with open(finders.find(source), 'rb') as fh:
+                    raw = fh.read()
+                page['requests_before'] += 1
+                page['raw'] += len(raw)
+            built = assets.build_bundle(name, sources).encode()
+            page['requests_after'] += 1
+            page['minified'] += len(built)
+            page['gzip'] += len(gzip.compress(built, compresslevel=9))
+            if brotli is not None:
+                page['brotli'] += len(brotli.compress(built))
+
+        header = f"{'page':<14}{'requests':>10}{'sources':>10}{'minified':>10}{'gzip':>10}"
+        if brotli is not None:
+            header += f"{'brotli':>10}"
+        self.stdout.write(header)
+        for name, page in sorted(pages.items()):
+            line = (
+                f"{name:<14}{page['requests_before']:>5} -> {page['requests_after']}"
+                f"{page['raw']:>10}{page['minified']:>10}{page['gzip']:>10}"
+            )
+            if brotli is not None:
+                line += f"{page['brotli']:>10}"
+            self.stdout.write(line)
+        self.stdout.write("Bytes per page load, before vs. after collectstatic; external CDN assets not included.")
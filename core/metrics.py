@@ -0,0 +1,147 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+Every worker process keeps its own numbers; scrape each worker (or sum
+them in Prometheus) when running more than one. Per-request figures
+(query count/time, template time) are collected through a context
+variable, so they follow a request into sync_to_async threads.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds in seconds; +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "bloo_request_duration_seconds": ("histogram", "Request latency by route"),
+    "bloo_requests_total": ("counter", "Responses by route and status class"),
+    "bloo_db_queries_total": ("counter", "ORM queries run while serving a route"),
+    "bloo_db_query_seconds_total": ("counter", "Time spent in ORM queries by route"),
+    "bloo_template_render_seconds_total": ("counter", "Time spent rendering templates by route"),
+    "bloo_cache_requests_total": ("counter", "Application cache lookups by result"),
+    "bloo_ratelimit_rejections_total": ("counter", "Requests answered 429 by policy"),
+}
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time", "template_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+
+current = contextvars.ContextVar("request_stats", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (route, method) -> per-bucket counts, then +Inf count, sum
+            self._histograms = {}
+            # (metric, label pairs) -> value
+            self._counters = defaultdict(float)
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._counters[name, tuple(labels)] += value
+
+    def observe_request(self, route, method, status, duration, stats):
+        key = (route, method)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(BUCKETS)] += 1
+            histogram[-1] += duration
+            labels = (("route", route),)
+            self._counters["bloo_requests_total", labels + (("method", method), ("status", f"{status // 100}xx"))] += 1
+            if stats is not None:
+                self._counters["bloo_db_queries_total", labels] += stats.queries
+                self._counters["bloo_db_query_seconds_total", labels] += stats.query_time
+                self._counters["bloo_template_render_seconds_total", labels] += stats.template_time
+
+    def render(self):
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+        by_name = defaultdict(list)
+        for (name, labels), value in counters.items():
+            by_name[name].append((labels, value))
+
+        lines = []
+        for name, (kind, text) in HELP.items():
+            if name == "bloo_request_duration_seconds":
+                samples = histograms
+            else:
+                samples = by_name.get(name)
+            if not samples:
+                continue
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+            if kind == "histogram":
+                for (route, method), values in sorted(samples.items()):
+                    base = (("route", route), ("method", method))
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), values):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(base + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(base)} {values[-1]:.6f}")
+                    lines.append(f"{name}_count{_labels(base)} {cumulative}")
+            else:
+                for labels, value in sorted(samples):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def time_queries(execute, sql, params, many, context):
+    """connection.execute_wrapper hook; a no-op outside an instrumented request"""
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver: every new DB connection reports its queries"""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def record_template(duration):
+    stats = current.get()
+    if stats is not None:
+        stats.template_time += duration
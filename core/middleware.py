@@ -1,35 +1,251 @@
+import logging
+import os
 import time
-from django.core.cache import cache
-from django.http import JsonResponse, HttpResponse
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.urls import Resolver404, resolve
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+from .ratelimit import client_key, get_limiter, load_policies
+from .warmup import WARMUP_ENVIRON_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class StaticPagesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, plus the prerendered pages under PRERENDER_ROOT.
+
+    Those keep fixed URLs, so instead of WhiteNoise's short default they
+    get PRERENDER_MAX_AGE and may be served stale while a CDN revalidates.
+    Unlike stock WhiteNoise it can sit in an async middleware stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+    def add_cache_headers(self, headers, path, url):
+        root = getattr(settings, "WHITENOISE_ROOT", None)
+        if root and self.path_is_child_of(path, os.path.join(os.path.abspath(root), "")):
+            headers["Cache-Control"] = (
+                f"public, max-age={settings.PRERENDER_MAX_AGE}, stale-while-revalidate=86400"
+            )
+            return
+        super().add_cache_headers(headers, path, url)
+
+
+class InstrumentationMiddleware:
+    """
+    Feeds core.metrics: latency per route, ORM queries and template time.
+
+    Every response gets a Server-Timing header, and METRICS_PATH answers
+    with the Prometheus exposition for this process. Goes first in
+    MIDDLEWARE so throttled and static responses are timed too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path = getattr(settings, "METRICS_PATH", "/metrics")
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path == self.path:
+            return self._metrics(request)
+        stats, start = metrics.RequestStats(), time.perf_counter()
+        token = metrics.current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        return self._record(request, response, stats, start)
+
+    async def __acall__(self, request):
+        if request.path == self.path:
+            return self._metrics(request)
+        stats, start = metrics.RequestStats(), time.perf_counter()
+        token = metrics.current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        return self._record(request, response, stats, start)
+
+    def _record(self, request, response, stats, start):
+        duration = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        route = "/" + match.route if match else "unmatched"
+        metrics.registry.observe_request(route, request.method, response.status_code, duration, stats)
+        if getattr(settings, "SERVER_TIMING", True):
+            response.headers["Server-Timing"] = (
+                f'db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries", '
+                f"tpl;dur={stats.template_time * 1000:.1f}, total;dur={duration * 1000:.1f}"
+            )
+        return response
+
+    def _metrics(self, request):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        if token:
+            allowed = request.headers.get("Authorization") == f"Bearer {token}"
+        else:
+            # REMOTE_ADDR, not X-Forwarded-For: a client can write that one itself
+            allowed = request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ())
+        if not allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class NotModifiedMiddleware:
+    """
+    Answers revalidations of @cache_profile views with 304 before they run.
+
+    Sits right above GlobalRateLimitMiddleware, so a client checking that
+    its copy is still fresh costs one cache read, no ORM query, and isn't
+    counted against its limit. A stale or made-up validator falls through
+    to the limiter and the view as usual.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        match = self._match(request)
+        if match is not None:
+            response = async_to_sync(self._not_modified)(request, match)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        match = self._match(request)
+        if match is not None:
+            response = await self._not_modified(request, match)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def _match(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        if "HTTP_IF_NONE_MATCH" not in request.META and "HTTP_IF_MODIFIED_SINCE" not in request.META:
+            return None
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return None
+        profile = getattr(match.func, "cache_profile", None)
+        return match if profile is not None and profile.conditional else None
+
+    async def _not_modified(self, request, match):
+        profile = match.func.cache_profile
+        response, etag, last_modified = await profile.check(request, *match.args, **match.kwargs)
+        if response is None:
+            return None
+        # For the route label in the request metrics
+        request.resolver_match = match
+        return profile.finish(request, response, etag, last_modified)
+
 
 class GlobalRateLimitMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.limit = getattr(settings, "RATE_LIMIT_DEFAULT", 100)
-        self.window = getattr(settings, "RATE_LIMIT_WINDOW_SECONDS", 60)
+        self.limiter = get_limiter()
+        self.policies = load_policies()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
         if request.path in ("/health", "/healthz", "/ping"):
             return HttpResponse("ok")
+        if request.META.get(WARMUP_ENVIRON_KEY):
+            # core.warmup priming pages from inside the process, not a visitor
+            return self.get_response(request)
 
-        ip = self._client_ip(request)
-        key = f"rate:{ip}:{int(time.time() // self.window)}"
-        count = cache.get(key, 0)
+        policy = self._policy(request)
+        try:
+            result = self.limiter.hit(policy, client_key(request))
+        except Exception:
+            # A broken limiter store must not take the site down with it
+            logger.exception("Rate limiter backend failed; letting request through")
+            return self.get_response(request)
 
-        if count >= self.limit:
-            return JsonResponse({"detail": "Too Many Requests"}, status=429)
+        if not result.allowed:
+            return self._add_headers(self._rejected(policy, result), result)
+        return self._add_headers(self.get_response(request), result)
 
-        cache.incr(key) if cache.get(key) is not None else cache.set(key, 1, timeout=self.window)
-        response = self.get_response(request)
-        remaining = max(self.limit - (count + 1), 0)
-        response.headers["X-RateLimit-Limit"] = str(self.limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Window"] = str(self.window)
+    async def __acall__(self, request):
+        if request.path in ("/health", "/healthz", "/ping"):
+            return HttpResponse("ok")
+        if request.META.get(WARMUP_ENVIRON_KEY):
+            return await self.get_response(request)
+
+        policy = self._policy(request)
+        try:
+            # Backends do blocking I/O; keep it off the event loop
+            result = await sync_to_async(self.limiter.hit, thread_sensitive=False)(
+                policy, client_key(request),
+            )
+        except Exception:
+            logger.exception("Rate limiter backend failed; letting request through")
+            return await self.get_response(request)
+
+        if not result.allowed:
+            return self._add_headers(self._rejected(policy, result), result)
+        return self._add_headers(await self.get_response(request), result)
+
+    def _policy(self, request):
+        return next(p for p in self.policies if p.matches(request))
+
+    def _rejected(self, policy, result):
+        metrics.registry.inc("bloo_ratelimit_rejections_total", (("policy", policy.name),))
+        response = JsonResponse({"detail": "Too Many Requests"}, status=429)
+        response.headers["Retry-After"] = str(result.retry_after)
         return response
 
-    def _client_ip(self, request) -> str:
-        hdr = request.META.get("HTTP_X_FORWARDED_FOR") or request.META.get("HTTP_X_REAL_IP")
-        if hdr:
-            return hdr.split(",")[0].strip()
-        return request.META.get("REMOTE_ADDR", "0.0.0.0")
+    def _add_headers(self, response, result):
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        response.headers["X-RateLimit-Window"] = str(result.window)
+        return response
@@ -0,0 +1,54 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template
+
+# template name -> file under PRERENDER_ROOT that WhiteNoise serves for it
+PAGES = {
+    "core/contact.html": "contact/index.html",
+    "core/coming-soon.html": "coming-soon/index.html",
+    "404.html": "404.html",
+}
+
+
+def needs_request(template_name) -> bool:
+    """Templates with a CSRF token differ per visitor and must stay dynamic"""
+    source = get_template(template_name).template.source
+    return "csrf_token" in source
+
+
+def build(root=None, log=None):
+    """Render every static page to disk with gzip/brotli siblings; returns written paths"""
+    from whitenoise.compress import Compressor
+
+    root = Path(root or settings.PRERENDER_ROOT)
+    compressor = Compressor(quiet=True)
+    written = []
+    for template_name, target in PAGES.items():
+        if needs_request(template_name):
+            if log:
+                log(f"Skipping {template_name}: it needs a CSRF token")
+            continue
+        path = root / target
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(get_template(template_name).render(), encoding="utf-8")
+        os.replace(tmp, path)
+        written.append(str(path))
+        written.extend(compressor.compress(str(path)))
+    prebuilt.cache_clear()
+    return written
+
+
+@lru_cache(maxsize=None)
+def prebuilt(template_name):
+    """Contents of a prerendered page, or None if the build step has not run"""
+    target = PAGES.get(template_name)
+    if not target:
+        return None
+    try:
+        return (Path(settings.PRERENDER_ROOT) / target).read_text(encoding="utf-8")
+    except OSError:
+        return None
@@ -0,0 +1,377 @@
+import functools
+import ipaddress
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class Policy(NamedTuple):
+    name: str
+    limit: int
+    window: int
+    path: str = "/"
+    methods: tuple = ()
+
+    def matches(self, request) -> bool:
+        if not request.path.startswith(self.path):
+            return False
+        return not self.methods or request.method in self.methods
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    window: int
+    retry_after: int
+
+
+class LocMemBackend:
+    """
+    Per-process counters; only for development and tests.
+
+    Holds at most max_entries keys, dropping the least recently hit first.
+    """
+
+    def __init__(self, location=None, max_entries=10000, **options):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+
+    def hit(self, key: str, window_id: int, window: int) -> tuple:
+        with self._lock:
+            current_id, current, previous = self._windows.pop(key, (window_id, 0, 0))
+            if current_id != window_id:
+                previous = current if current_id == window_id - 1 else 0
+                current = 0
+            current += 1
+            self._windows[key] = (window_id, current, previous)
+            if len(self._windows) > self.max_entries:
+                self._windows.popitem(last=False)
+            return current, previous
+
+    def peek(self, key: str, window_id: int, window: int) -> tuple:
+        with self._lock:
+            return _rolled(self._windows.get(key), window_id)
+
+
+def _rolled(row, window_id):
+    """(current, previous) of a stored (window_id, current, previous) as seen from window_id"""
+    if row is None:
+        return 0, 0
+    stored_id, current, previous = row
+    if stored_id == window_id:
+        return current, previous
+    return 0, current if stored_id == window_id - 1 else 0
+
+
+def _zeros(size):
+    return array("I", bytes(size * array("I").itemsize))
+
+
+class SketchBackend:
+    """
+    Per-process counters in fixed memory: a count-min sketch per window.
+
+    Memory is width x depth counters for the current and the previous
+    window of each window length, however many keys show up, and no key
+    can push another one out. Collisions only ever inflate a count, so a
+    flood of fresh keys can't help anyone get under a limit. At worst it
+    makes a busy window a little stricter: by about (distinct keys in the
+    window) / width hits, kept small by the conservative update that only
+    raises the cells holding the minimum. The defaults take 4 MB per
+    window length and stay within a hit or two at a million clients.
+    """
+
+    def __init__(self, location=None, width=1 << 17, depth=4, **options):
+        self.width = 1 << (max(width, 2) - 1).bit_length()  # a power of two, for masking
+        self.depth = depth
+        self._lock = threading.Lock()
+        # window length -> [window_id, current sketch, previous sketch]
+        self._sketches = {}
+
+    def _cells(self, key):
+        # str hashes are salted per process, so nobody outside can aim for
+        # collisions; rows are spread with double hashing
+        h = hash(key)
+        step = (h >> 32) | 1
+        mask, width = self.width - 1, self.width
+        return [row * width + ((h + row * step) & mask) for row in range(self.depth)]
+
+    def hit(self, key: str, window_id: int, window: int) -> tuple:
+        cells = self._cells(key)
+        with self._lock:
+            state = self._sketches.get(window)
+            if state is None or window_id > state[0]:
+                size = self.width * self.depth
+                previous = state[1] if state is not None and state[0] == window_id - 1 else _zeros(size)
+                state = self._sketches[window] = [window_id, _zeros(size), previous]
+            _, current, previous = state
+            count = min([current[cell] for cell in cells]) + 1
+            for cell in cells:
+                if current[cell] < count:
+                    current[cell] = count
+            return count, min([previous[cell] for cell in cells])
+
+    def peek(self, key: str, window_id: int, window: int) -> tuple:
+        cells = self._cells(key)
+        with self._lock:
+            state = self._sketches.get(window)
+            if state is None:
+                return 0, 0
+            stored_id, current, previous = state
+            counts = (min([current[cell] for cell in cells]), min([previous[cell] for cell in cells]))
+        return _rolled((stored_id, *counts), window_id)
+
+
+class SQLiteBackend:
+    """
+    Counters in a SQLite file shared by every worker on the host.
+
+    Each hit is a single UPSERT ... RETURNING that rolls the window over,
+    increments and reads back both windows, so there is no read/modify/write
+    race between processes. Rows carry the time, in seconds, after which
+    they can't count as anyone's previous window any more; the periodic
+    cleanup goes by that, since window ids of different window lengths
+    can't be compared.
+    """
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, location=None, **options):
+        if not location:
+            raise ImproperlyConfigured("SQLiteBackend needs RATE_LIMIT_LOCATION set to a file path.")
+        self.location = str(location)
+        self.timeout = options.get("timeout", 5)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.location, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ratelimit ("
+                "key TEXT PRIMARY KEY, window_id INTEGER NOT NULL, "
+                "current INTEGER NOT NULL, previous INTEGER NOT NULL, "
+                "expires_at INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ratelimit)")}
+            if "expires_at" not in columns:
+                # Files created before expires_at; their rows get it on the next hit
+                conn.execute("ALTER TABLE ratelimit ADD COLUMN expires_at INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS ratelimit_expires_at ON ratelimit (expires_at)")
+            self._local.conn = conn
+            self._local.hits = 0
+        return conn
+
+    def hit(self, key: str, window_id: int, window: int) -> tuple:
+        conn = self._connection()
+        window_start = window_id * window
+        # The counter is read as the previous window until the next one ends
+        expires_at = window_start + 2 * window
+        # SET expressions all see the row as it was before this statement
+        current, previous = conn.execute(
+            "INSERT INTO ratelimit (key, window_id, current, previous, expires_at) VALUES (?, ?, 1, 0, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "previous = CASE WHEN window_id = excluded.window_id THEN previous "
+            "WHEN window_id = excluded.window_id - 1 THEN current ELSE 0 END, "
+            "current = CASE WHEN window_id = excluded.window_id THEN current + 1 ELSE 1 END, "
+            "window_id = excluded.window_id, "
+            "expires_at = excluded.expires_at "
+            "RETURNING current, previous",
+            (key, window_id, expires_at),
+        ).fetchone()
+        self._local.hits += 1
+        if self._local.hits % self.CLEANUP_EVERY == 0:
+            # The start of the current window is a time every policy has reached
+            conn.execute("DELETE FROM ratelimit WHERE expires_at <= ?", (window_start,))
+        return current, previous
+
+    def peek(self, key: str, window_id: int, window: int) -> tuple:
+        row = self._connection().execute(
+            "SELECT window_id, current, previous FROM ratelimit WHERE key = ?", (key,),
+        ).fetchone()
+        return _rolled(row, window_id)
+
+
+class RedisBackend:
+    """
+    Counters in Redis (or anything speaking its protocol).
+
+    One MULTI/EXEC round-trip increments the current window, sets its
+    expiry and reads the previous window. Needs the ``redis`` package;
+    pass ``client=`` to use an already built client such as a local
+    stand-in server.
+    """
+
+    def __init__(self, location=None, client=None, **options):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise ImproperlyConfigured("RedisBackend requires the 'redis' package.") from exc
+            client = redis.Redis.from_url(location or "redis://localhost:6379/0", **options)
+        self.client = client
+
+    def hit(self, key: str, window_id: int, window: int) -> tuple:
+        current_key = f"rl:{key}:{window_id}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(f"rl:{key}:{window_id - 1}")
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def peek(self, key: str, window_id: int, window: int) -> tuple:
+        current, previous = self.client.mget(f"rl:{key}:{window_id}", f"rl:{key}:{window_id - 1}")
+        return int(current or 0), int(previous or 0)
+
+
+class RateLimiter:
+    """Sliding-window counter on top of any backend exposing hit() and peek()"""
+
+    def __init__(self, backend, clock=time.time):
+        self.backend = backend
+        self.clock = clock
+
+    def hit(self, policy: Policy, identity: str) -> RateLimitResult:
+        """Count a request and say whether it is within the limit"""
+        now = self.clock()
+        window_id = int(now // policy.window)
+        current, previous = self.backend.hit(f"{policy.name}:{identity}", window_id, policy.window)
+        return self._result(policy, now, window_id, current, previous)
+
+    def check(self, policy: Policy, identity: str) -> RateLimitResult:
+        """What hit() would answer right now, without counting anything"""
+        now = self.clock()
+        window_id = int(now // policy.window)
+        current, previous = self.backend.peek(f"{policy.name}:{identity}", window_id, policy.window)
+        return self._result(policy, now, window_id, current + 1, previous)
+
+    def _result(self, policy, now, window_id, current, previous):
+        # Weight the previous window by how much of it still overlaps
+        # the sliding window ending now.
+        elapsed = now - window_id * policy.window
+        estimate = previous * (1 - elapsed / policy.window) + current
+        allowed = estimate <= policy.limit
+        remaining = max(policy.limit - math.ceil(estimate), 0)
+        retry_after = 0 if allowed else max(math.ceil(policy.window - elapsed), 1)
+        return RateLimitResult(allowed, policy.limit, remaining, policy.window, retry_after)
+
+
+@functools.cache
+def trusted_proxies():
+    return tuple(
+        ipaddress.ip_network(cidr, strict=False)
+        for cidr in getattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", ())
+    )
+
+
+@receiver(setting_changed)
+def _reset_trusted_proxies(setting, **kwargs):
+    if setting == "RATE_LIMIT_TRUSTED_PROXIES":
+        trusted_proxies.cache_clear()
+
+
+def parse_ip(value):
+    """An ip_address from a header or REMOTE_ADDR value, ports and brackets allowed; None if invalid"""
+    value = value.strip()
+    if value.startswith("["):
+        value = value[1:].partition("]")[0]
+    elif value.count(":") == 1:
+        value = value.partition(":")[0]
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    return getattr(address, "ipv4_mapped", None) or address
+
+
+def _trusted(address, proxies):
+    return any(address in network for network in proxies)
+
+
+def client_ip(request) -> str:
+    """
+    The address of the client, as far as our own proxies can vouch for it.
+
+    X-Forwarded-For is only read when the peer is one of
+    RATE_LIMIT_TRUSTED_PROXIES. Then it is walked from the right, and the
+    first address that isn't another trusted proxy is the client. Entries
+    to the left of it were written by the client and can be anything.
+    """
+    remote = parse_ip(request.META.get("REMOTE_ADDR", ""))
+    if remote is None:
+        return request.META.get("REMOTE_ADDR") or "0.0.0.0"
+    proxies = trusted_proxies()
+    if not _trusted(remote, proxies):
+        return str(remote)
+    hops = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+    if not any(hop.strip() for hop in hops):
+        hops = [request.META.get("HTTP_X_REAL_IP", "")]
+    client = remote
+    for hop in reversed(hops):
+        address = parse_ip(hop)
+        if address is None:
+            # Not written by a proxy we run; stop at the last hop we trust
+            break
+        client = address
+        if not _trusted(address, proxies):
+            break
+    return str(client)
+
+
+def client_key(request) -> str:
+    """
+    Rate-limit identity of the client: its IPv4 address, or its IPv6 network.
+
+    One IPv6 subscriber usually gets a whole /64, so counting single
+    addresses would give them 2**64 separate allowances.
+    """
+    ip = client_ip(request)
+    address = parse_ip(ip)
+    if address is None or address.version == 4:
+        return ip
+    prefix = getattr(settings, "RATE_LIMIT_IPV6_PREFIX", 64)
+    return str(ipaddress.ip_network((address, prefix), strict=False))
+
+
+def load_policies():
+    """Policies from RATE_LIMIT_POLICIES, first match wins, global default last"""
+    policies = [
+        Policy(
+            name=conf.get("name", conf["path"]),
+            limit=conf["limit"],
+            window=conf.get("window", settings.RATE_LIMIT_WINDOW_SECONDS),
+            path=conf["path"],
+            methods=tuple(m.upper() for m in conf.get("methods", ())),
+        )
+        for conf in getattr(settings, "RATE_LIMIT_POLICIES", [])
+    ]
+    policies.append(Policy(
+        name="default",
+        limit=getattr(settings, "RATE_LIMIT_DEFAULT", 100),
+        window=getattr(settings, "RATE_LIMIT_WINDOW_SECONDS", 60),
+    ))
+    return policies
+
+
+def get_limiter():
+    backend_cls = import_string(getattr(settings, "RATE_LIMIT_BACKEND", "core.ratelimit.LocMemBackend"))
+    backend = backend_cls(
+        getattr(settings, "RATE_LIMIT_LOCATION", None),
+        **getattr(settings, "RATE_LIMIT_OPTIONS", {}),
+    )
+    return RateLimiter(backend)
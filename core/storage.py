@@ -0,0 +1,30 @@
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets
+
+
+class BundledStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed and compressed storage, plus the STATIC_BUNDLES.
+
+    collectstatic writes each bundle before post-processing, so bundles get
+    content hashes and .gz (and .br with ``brotli`` installed) variants
+    like any other collected file.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name, sources in assets.bundles().items():
+                if self.exists(name):
+                    self.delete(name)
+                self.save(name, ContentFile(assets.build_bundle(name, sources).encode()))
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def url(self, name, force=False):
+        if not self.hashed_files:
+            # Nothing collected yet (development, tests): plain, unhashed URLs
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
@@ -0,0 +1,29 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.template.backends.django import reraise
+
+from .metrics import record_template
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - start)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock Django backend, reporting render time to core.metrics"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
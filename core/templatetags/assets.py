@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from core import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    Tags for one STATIC_BUNDLES entry: the collected bundle, or its source
+    files in development and before collectstatic has built it.
+    """
+    if not settings.DEBUG and name in getattr(staticfiles_storage, "hashed_files", {}):
+        urls = [static(name)]
+    else:
+        urls = [static(source) for source in assets.bundles()[name]]
+    if name.endswith(".css"):
+        return format_html_join("\n", '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join("\n", '<script src="{}"></script>', ((url,) for url in urls))
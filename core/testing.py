@@ -0,0 +1,11 @@
+from django.test import TestCase, override_settings
+
+
+@override_settings(RATE_LIMIT_BACKEND="core.ratelimit.LocMemBackend", SECURE_SSL_REDIRECT=False)
+class SiteTestCase(TestCase):
+    """
+    TestCase for requests through the full middleware stack: rate limits
+    counted in memory instead of the SQLite file, and plain HTTP.
+
+    Subclasses add their own @override_settings on top of these.
+    """
@@ -1,3 +1,326 @@
-from django.test import TestCase
+import gzip
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings, tag
+from django.urls import reverse
+
+from django.template import Context, Template
+
+from bloolast.database import database_settings
+
+from . import metrics, prerender, warmup
+from .assets import minify_css, minify_js
+from .ratelimit import (
+    LocMemBackend, Policy, RateLimiter, RedisBackend, SketchBackend, SQLiteBackend, client_ip, client_key,
+)
+from .management.commands.importtime_report import parse_importtime
+from .middleware import StaticPagesMiddleware
+from .testing import SiteTestCase
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_gets_persistent_connections_and_pragmas(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            database = database_settings(Path('/srv'))['default']
+        self.assertEqual(database['NAME'], Path('/srv/db.sqlite3'))
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('journal_mode=WAL', database['OPTIONS']['init_command'])
+
+    def test_postgres_pool_replaces_persistent_connections(self):
+        env = {'DB_ENGINE': 'django.db.backends.postgresql', 'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '20'}
+        with mock.patch.dict(os.environ, env, clear=True):
+            database = database_settings(Path('/srv'))['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 20)
+        self.assertNotIn('CONN_HEALTH_CHECKS', database)
+
+
+class InstrumentationTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_server_timing_and_prometheus_exposition(self):
+        response = self.client.get(reverse('mentor_list'))
+        self.assertRegex(response.headers['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 403)
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('bloo_request_duration_seconds_count{route="/mentors/",method="GET"} 1', body)
+        self.assertIn('bloo_requests_total{route="/mentors/",method="GET",status="2xx"} 1', body)
+        self.assertIn('bloo_cache_requests_total{cache="list-html",result="miss"} 1', body)
+        self.assertRegex(body, r'bloo_db_queries_total\{route="/mentors/"\} [1-9]')
+
+
+class AssetPipelineTests(SimpleTestCase):
+    def test_css_minifier_keeps_strings_and_descendant_pseudo_classes(self):
+        css = '/* note */\na :hover ,\nb > i {\n  content: "a  ;  b";\n  color: red;\n}\n'
+        self.assertEqual(minify_css(css), 'a :hover,b>i{content:"a  ;  b";color:red}')
+
+    def test_js_ships_unminified_without_rjsmin(self):
+        js = "const url = 'https://bloo.az'; // home\nconst re = /\\/\\//g;\nconst t = `\n  // kept\n`;\n"
+        with mock.patch('core.assets.rjsmin', None):
+            self.assertEqual(minify_js(js), js)
+
+    @override_settings(STATIC_BUNDLES={"bundles/page.js": ["js/app.js", "js/home.js"]})
+    def test_bundle_tag_falls_back_to_sources_before_collectstatic(self):
+        html = Template("{% load assets %}{% bundle 'bundles/page.js' %}").render(Context())
+        self.assertEqual(html, '<script src="/static/js/app.js"></script>\n<script src="/static/js/home.js"></script>')
+
+
+class PrerenderTests(SiteTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        prerender_root = override_settings(PRERENDER_ROOT=root.name)
+        prerender_root.enable()
+        self.addCleanup(prerender_root.disable)
+        prerender.prebuilt.cache_clear()
+        self.addCleanup(prerender.prebuilt.cache_clear)
+
+    def test_build_writes_pages_with_compressed_copies(self):
+        written = prerender.build()
+        for target in prerender.PAGES.values():
+            page = self.root / target
+            self.assertIn(str(page), written)
+            with gzip.open(f'{page}.gz', 'rt', encoding='utf-8') as fh:
+                self.assertEqual(fh.read(), page.read_text(encoding='utf-8'))
+        self.assertIn('<html', (self.root / 'contact/index.html').read_text(encoding='utf-8').lower())
+
+    def test_templates_with_a_csrf_token_stay_dynamic(self):
+        self.assertTrue(prerender.needs_request('mentors/ask_question.html'))
+        self.assertFalse(prerender.needs_request('core/contact.html'))
+        pages = {'core/contact.html': 'contact/index.html', 'mentors/ask_question.html': 'ask/index.html'}
+        log = mock.Mock()
+        with mock.patch.object(prerender, 'PAGES', pages):
+            prerender.build(log=log)
+        self.assertTrue((self.root / 'contact/index.html').exists())
+        self.assertFalse((self.root / 'ask').exists())
+        log.assert_called_once_with("Skipping mentors/ask_question.html: it needs a CSRF token")
+
+    def test_prerendered_pages_get_their_own_cache_header(self):
+        prerender.build()
+        with override_settings(WHITENOISE_ROOT=str(self.root), PRERENDER_MAX_AGE=120):
+            middleware = StaticPagesMiddleware(lambda request: HttpResponse("view"))
+            response = middleware(RequestFactory().get('/contact/'))
+            self.assertEqual(response.headers['Cache-Control'], 'public, max-age=120, stale-while-revalidate=86400')
+            self.assertEqual(middleware(RequestFactory().get('/mentors/')).content, b"view")
+            headers = {}
+            middleware.add_cache_headers(headers, '/srv/staticfiles/js/app.js', '/static/js/app.js')
+        self.assertEqual(headers['Cache-Control'], f'max-age={middleware.max_age}, public')
+
+    def test_404_serves_the_prebuilt_page(self):
+        (self.root / '404.html').write_text("<p>prebuilt not found</p>", encoding='utf-8')
+        response = self.client.get('/no-such-page/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b"<p>prebuilt not found</p>")
+
+    def test_rebuild_replaces_the_cached_pages(self):
+        self.assertIsNone(prerender.prebuilt('404.html'))
+        (self.root / '404.html').write_text("old build", encoding='utf-8')
+        self.assertIsNone(prerender.prebuilt('404.html'))  # cached miss
+        prerender.prebuilt.cache_clear()
+        self.assertEqual(prerender.prebuilt('404.html'), "old build")
+
+        prerender.build()
+        rendered = (self.root / '404.html').read_text(encoding='utf-8')
+        self.assertNotEqual(rendered, "old build")
+        self.assertEqual(prerender.prebuilt('404.html'), rendered)
+        self.assertEqual(self.client.get('/no-such-page/').content.decode(), rendered)
+
+
+@override_settings(ALLOWED_HOSTS=['bloo.az'])
+class WarmupTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_compiles_templates_and_primes_page_caches(self):
+        self.assertIn('core/home.html', warmup.template_names())
+        self.assertEqual(warmup.compile_templates(), [])
+        self.assertEqual(warmup.prime_pages(['/mentors/']), {'/mentors/': 200})
+
+        timings = warmup.warm(paths=['/mentors/'])
+        self.assertEqual(set(timings), {'templates', 'urls', 'pages'})
+        self.client.get(reverse('mentor_list'), HTTP_HOST='bloo.az')
+        body = metrics.registry.render()
+        self.assertIn('bloo_cache_requests_total{cache="list-html",result="hit"} 1', body)
+        self.assertNotIn('result="miss"', body)
+
+    @override_settings(RATE_LIMIT_DEFAULT=2, RATE_LIMIT_POLICIES=[])
+    def test_warm_up_requests_are_not_rate_limited(self):
+        paths = ['/mentors/', '/mentors/?page=2', '/mentors/?page=3']
+        self.assertEqual(set(warmup.prime_pages(paths).values()), {200})
+
+    @override_settings(WARMUP_ON_START=True)
+    async def test_warm_up_is_skipped_inside_an_event_loop(self):
+        with mock.patch.object(warmup, 'warm') as warm, mock.patch.object(warmup.connections, 'close_all') as close:
+            warmup.warm_on_start()
+        warm.assert_not_called()
+        close.assert_not_called()
+
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   django.utils\n"
+            "import time:      3000 |       3120 | django\n"
+        )
+        self.assertEqual(parse_importtime(stderr), [('django.utils', 120, 120, 1), ('django', 3000, 3120, 0)])
+
+
+
+class FakeRedis:
+    """Just enough of a redis client for RedisBackend: INCR, EXPIRE and GET in a pipeline"""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        client, calls = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: calls.append((name, args))
+
+            def execute(self):
+                return [getattr(client, name)(*args) for name, args in calls]
+
+        return Pipeline()
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    def mget(self, *keys):
+        return [self.get(key) for key in keys]
+
+
+class RateLimitBackendTests(SimpleTestCase):
+    def test_sqlite_cleanup_keeps_longer_windows(self):
+        minute, day = Policy('default', limit=100000, window=60), Policy('daily', limit=2, window=86400)
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SQLiteBackend(os.path.join(directory, 'ratelimit.sqlite3'))
+            backend.CLEANUP_EVERY = 10
+            now = [86400 * 20000 + 3600.0]
+            limiter = RateLimiter(backend, clock=lambda: now[0])
+            self.assertTrue(limiter.hit(day, 'student').allowed)
+            self.assertTrue(limiter.hit(day, 'student').allowed)
+            # Hours of short-window traffic, with cleanups in between
+            for i in range(100):
+                now[0] += 120
+                limiter.hit(minute, f'visitor-{i}')
+            self.assertFalse(limiter.hit(day, 'student').allowed)
+
+            rows = dict(backend._connection().execute("SELECT key, current FROM ratelimit"))
+            # Minute counters go once they can't be a previous window any more
+            self.assertNotIn('default:visitor-0', rows)
+            self.assertLess(len(rows), backend.CLEANUP_EVERY)
+            self.assertEqual(rows['daily:student'], 3)
+            backend._connection().close()
+
+    def test_check_never_counts(self):
+        policy = Policy('default', limit=2, window=60)
+        with tempfile.TemporaryDirectory() as directory:
+            sqlite = SQLiteBackend(os.path.join(directory, 'ratelimit.sqlite3'))
+            for backend in (LocMemBackend(), SketchBackend(width=64), sqlite, RedisBackend(client=FakeRedis())):
+                now = [6000.0]
+                limiter = RateLimiter(backend, clock=lambda: now[0])
+                self.assertEqual(limiter.check(policy, 'a').remaining, 1, backend)
+                limiter.hit(policy, 'a')
+                limiter.hit(policy, 'a')
+                self.assertFalse(limiter.check(policy, 'a').allowed, backend)
+                self.assertTrue(limiter.check(policy, 'b').allowed, backend)
+                # Two windows later nothing is left to count
+                now[0] += 120
+                self.assertEqual(limiter.check(policy, 'a').remaining, 1, backend)
+            sqlite._connection().close()
+
+    def test_redis_counts_windows_and_expires_them(self):
+        client = FakeRedis()
+        limiter = RateLimiter(RedisBackend(client=client), clock=lambda: 6030.0)
+        policy = Policy('default', limit=2, window=60)
+        client.values['rl:default:203.0.113.5:99'] = 4  # previous window, half overlapping
+        result = limiter.hit(policy, '203.0.113.5')
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.retry_after, 30)
+        self.assertEqual(client.values['rl:default:203.0.113.5:100'], 1)
+        self.assertEqual(client.ttls['rl:default:203.0.113.5:100'], 120)
+        self.assertTrue(limiter.hit(policy, '198.51.100.7').allowed)
+
+
+# Distinct addresses in the synthetic flood: enough to overflow the LRU
+# backend in a regular run; RATE_LIMIT_FLOOD_CLIENTS=1000000 for the full-size one
+FLOOD_CLIENTS = int(os.getenv('RATE_LIMIT_FLOOD_CLIENTS', '100000'))
+
+
+@override_settings(RATE_LIMIT_TRUSTED_PROXIES=['10.0.0.0/8', '2001:db8:ffff::/48'])
+class ClientAddressTests(SimpleTestCase):
+    def ip(self, remote, forwarded=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded is not None else {}
+        return client_ip(RequestFactory().get('/', REMOTE_ADDR=remote, **extra))
+
+    def test_forwarded_for_is_only_believed_from_trusted_proxies(self):
+        self.assertEqual(self.ip('203.0.113.5', '198.51.100.1'), '203.0.113.5')
+        # Walked from the right: the spoofed entry on the left is ignored
+        self.assertEqual(self.ip('10.0.0.2', '6.6.6.6, 198.51.100.1, 10.1.1.1'), '198.51.100.1')
+        self.assertEqual(self.ip('10.0.0.2', '10.2.2.2, 10.1.1.1'), '10.2.2.2')
+        self.assertEqual(self.ip('10.0.0.2', 'garbage, [2001:db8::7]:443'), '2001:db8::7')
+        self.assertEqual(self.ip('10.0.0.2', ''), '10.0.0.2')
+        self.assertEqual(self.ip('::ffff:203.0.113.5'), '203.0.113.5')
+
+    def test_ipv6_clients_share_their_64(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='2001:db8:1:2:aaaa::1')
+        self.assertEqual(client_key(request), '2001:db8:1:2::/64')
+        request = RequestFactory().get('/', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(client_key(request), '203.0.113.5')
+
+
+@tag('perf')
+class RateLimitFloodTests(SimpleTestCase):
+    """FLOOD_CLIENTS one-off addresses in a single window, around a regular user and an abuser"""
+
+    def flood(self, backend):
+        policy = Policy('default', limit=100, window=60)
+        limiter = RateLimiter(backend, clock=lambda: 6000.0)
+        hit = backend.hit
+        every = max(1, FLOOD_CLIENTS // 100)
+        for i in range(FLOOD_CLIENTS):
+            hit(f'default:11.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}', 100, 60)
+            if i % every == 0:
+                # 100 evenly spread hits, whatever the size of the flood
+                limiter.hit(policy, 'abuser')
+        return limiter, policy
+
+    def test_sketch_keeps_throttling_in_fixed_memory(self):
+        backend = SketchBackend()
+        limiter, policy = self.flood(backend)
+        (_, current, previous), = backend._sketches.values()
+        self.assertEqual(len(current), backend.width * backend.depth)
+        self.assertEqual(len(current), len(previous))
+
+        self.assertFalse(limiter.hit(policy, 'abuser').allowed)
+        # Collisions only add a few hits to a newcomer's count
+        self.assertGreater(limiter.hit(policy, 'regular').remaining, 90)
+
+    def test_lru_backend_stays_bounded(self):
+        backend = LocMemBackend(max_entries=50000)
+        limiter, policy = self.flood(backend)
+        self.assertEqual(len(backend._windows), 50000)
+        # The abuser keeps hitting, so the flood doesn't push its counter out
+        self.assertFalse(limiter.hit(policy, 'abuser').allowed)
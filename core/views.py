@@ -1,19 +1,38 @@
 from django.shortcuts import render
+from django.http import HttpResponseNotFound
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .http_cache import cache_profile
+from .prerender import prebuilt
+from mentors import caching
 from mentors.models import Mentor
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 
-def home(request):
-    mentors = Mentor.objects.all()[:12]
-    return render(request, 'core/home.html', {'mentors': mentors})
+@cache_profile('mentor-pages', etag=caching.aetag, last_modified=caching.alast_modified)
+async def home(request):
+    async def render_grid():
+        # Only queried when the cached grid for this content version is missing
+        mentors = [mentor async for mentor in Mentor.objects.all()[:12]]
+        return render_to_string('core/mentor_grid.html', {'mentors': mentors})
 
+    grid = await caching.aget_or_render('home-grid', (), render_grid)
+    return render(request, 'core/home.html', {'mentor_grid': mark_safe(grid)})
+
+# WhiteNoise serves the prerendered copies of these pages; the views only
+# answer when `manage.py prerender_pages` has not been run.
+@cache_profile('static-pages')
 def contact(request):
     return render(request, 'core/contact.html')
 
+@cache_profile('static-pages')
 def coming_soon(request):
     return render(request, 'core/coming-soon.html')
 
-def handler404(request):
+def handler404(request, exception=None):
+    content = prebuilt('404.html')
+    if content is not None:
+        return HttpResponseNotFound(content)
     return render(request, '404.html', status=404)
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Getting a worker process ready before it takes traffic.
+
+warm() compiles every template under the TEMPLATES DIRS into the cached
+loader, populates the URL resolver and sends a GET for each WARMUP_PATHS
+entry through an in-process WSGI handler. That render fills the mentor
+caches the same way a visitor's request would; the rate limiter lets those
+requests through uncounted. It runs from bloolast.wsgi and bloolast.asgi
+when WARMUP_ON_START is set.
+
+A server that imports the ASGI app inside its own event loop, like plain
+``uvicorn bloolast.asgi:application``, gets no warm-up: the synchronous
+handler can't run async views from that thread, and the connections
+can't be closed there either. Warm those up with ``gunicorn --preload``
+and the UvicornWorker, which import the app in the master before any
+loop starts.
+
+Under ``gunicorn --preload`` that import happens once in the master. Every
+forked worker then starts with the compiled templates, resolver and cache
+entries already in memory, and shares those pages copy-on-write.
+gc.freeze() keeps the collector from writing to them and making each
+worker copy them. Database connections are closed before the fork so no
+two workers share a socket.
+"""
+import asyncio
+import gc
+import io
+import logging
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set in the environ of warm-up requests; a client can't send a key like it
+WARMUP_ENVIRON_KEY = 'bloo.warmup'
+
+
+def template_names():
+    """Names of every template under the project template directories"""
+    names = []
+    for engine in settings.TEMPLATES:
+        for directory in engine.get('DIRS', []):
+            root = Path(directory)
+            names.extend(
+                path.relative_to(root).as_posix()
+                for path in sorted(root.rglob('*')) if path.is_file()
+            )
+    return names
+
+
+def compile_templates():
+    """Load every project template once; returns the names that failed"""
+    failed = []
+    for name in template_names():
+        try:
+            get_template(name)
+        except TemplateSyntaxError:
+            logger.exception("Warm-up could not compile %s", name)
+            failed.append(name)
+    return failed
+
+
+def resolve_urls():
+    """Import every URLconf and build the reverse lookup tables"""
+    resolver = get_resolver()
+    return len(resolver.reverse_dict)
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def prime_pages(paths=None):
+    """GET each path through the full middleware stack; returns {path: status}"""
+    from django.core.handlers.wsgi import WSGIHandler
+
+    if paths is None:
+        paths = settings.WARMUP_PATHS
+    handler = WSGIHandler()
+    host = _host()
+    statuses = {}
+    for path in paths:
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': host, 'SERVER_PORT': '443', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host, 'REMOTE_ADDR': '127.0.0.1', WARMUP_ENVIRON_KEY: True,
+            'wsgi.url_scheme': 'https', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.version': (1, 0), 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        status = []
+        response = handler(environ, lambda s, h, exc_info=None: status.append(int(s.split()[0])))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        statuses[path + ('?' + query if query else '')] = status[0]
+        if status[0] >= 400:
+            logger.warning("Warm-up request for %s answered %s", path, status[0])
+    return statuses
+
+
+def warm(paths=None):
+    """
+    Run every warm-up step; returns {step: seconds}.
+
+    A failing step is logged and skipped: a worker that starts cold is
+    better than one that doesn't start.
+    """
+    timings = {}
+    steps = [
+        ('templates', compile_templates),
+        ('urls', resolve_urls),
+        ('pages', lambda: prime_pages(paths)),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %r failed", name)
+        timings[name] = time.perf_counter() - start
+    # The warm-up requests are not traffic
+    metrics.registry.reset()
+    return timings
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def warm_on_start():
+    """Called from bloolast.wsgi/asgi once the application object exists"""
+    if not getattr(settings, 'WARMUP_ON_START', False):
+        return
+    if _in_event_loop():
+        logger.info("Skipping warm-up: the application is being imported inside an event loop")
+        return
+    warm()
+    # Workers forked from here must open their own connections
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,19 @@
+"""
+Gunicorn settings; picked up automatically when gunicorn starts in this directory.
+
+    gunicorn bloolast.wsgi
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn bloolast.asgi
+
+preload_app imports the application, and with it core.warmup, once in the
+master, so workers fork with templates, URLconfs and caches already loaded.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+preload_app = True
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
@@ -1,24 +1,108 @@
+from collections import defaultdict
+
 from django.contrib import admin
 from django.core.mail import send_mail
 from django.conf import settings
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse, path
 from django.utils import timezone
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponseRedirect
-from .models import Mentor, MentorPage, Question
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponseRedirect
+from django.db import transaction
+from django.db.models import Count, Q
+from .assignment import MentorIndex, assign_pending
+from .export import FORMATS, export_queryset, streaming_response
+from .archive import cached_status_totals, totals_by_mentor
+from .models import ArchivedQuestion, EmailJob, Mentor, MentorPage, Question
+from .outbox import STATUS_FIELDS, batch_progress, enqueue_many, new_batch
+from .rollup import dashboard
+from .similarity import similar_answers
+
+class PendingQuestionsFilter(admin.SimpleListFilter):
+    title = 'pending questions'
+    parameter_name = 'pending'
+    
+    def lookups(self, request, model_admin):
+        return (('yes', 'Has pending questions'), ('no', 'No pending questions'))
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(_pending_count__gt=0)
+        if self.value() == 'no':
+            return queryset.filter(_pending_count=0)
+        return queryset
+
+# Statuses a question reaches once its mentor has answered
+ANSWERED_STATUSES = ('answered', 'approved', 'rejected', 'sent')
+# Periods, in days, the SLA dashboard offers
+SLA_PERIODS = ('7', '30', '90', '365')
 
 @admin.register(Mentor)
 class MentorAdmin(admin.ModelAdmin):
-    list_display = ('name', 'university', 'department', 'is_active', 'pending_questions_count')
-    list_filter = ('is_active', 'university')
+    list_display = ('name', 'university', 'department', 'is_active', 'pending_questions_count', 'answered_count')
+    list_filter = ('is_active', 'university', PendingQuestionsFilter)
     search_fields = ('name', 'university', 'department')
     prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('pending_questions',)
+    
+    def get_queryset(self, request):
+        # One aggregated query for the whole page instead of a COUNT per row
+        queryset = super().get_queryset(request).annotate(
+            _pending_count=Count('question', filter=Q(question__status='pending')),
+        )
+        # Subqueries, since a second join would multiply the pending count
+        return totals_by_mentor(queryset, '_answered_count', ANSWERED_STATUSES)
     
     def pending_questions_count(self, obj):
-        return obj.pending_questions_count()
+        return obj._pending_count
     pending_questions_count.short_description = 'Pending Questions'
+    pending_questions_count.admin_order_field = '_pending_count'
+    
+    def answered_count(self, obj):
+        return obj._answered_count
+    answered_count.short_description = 'Answered (all time)'
+    answered_count.admin_order_field = '_answered_count'
+
+@admin.register(EmailJob)
+class EmailJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('kind', 'question', 'to_email', 'subject', 'body', 'attempts', 'locked_at',
+                       'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        """Put failed or waiting jobs back at the front of the queue"""
+        jobs = queryset.filter(status__in=('queued', 'failed'))
+        for kind, field in STATUS_FIELDS.items():
+            Question.objects.filter(email_jobs__in=jobs.filter(kind=kind)).update(**{field: 'queued'})
+        updated = jobs.update(status='queued', next_attempt_at=timezone.now(), attempts=0)
+        self.message_user(request, f"Requeued {updated} emails.")
+    retry_now.short_description = "Retry selected emails now"
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('batch/<str:batch>/', self.admin_site.admin_view(self.batch_progress_view), name='mentors_emailjob_batch'),
+        ]
+        return custom_urls + urls
+    
+    def batch_progress_view(self, request, batch):
+        """Delivery progress of the emails queued by one bulk action"""
+        from django.template.response import TemplateResponse
+        progress = batch_progress(batch)
+        context = {
+            **self.admin_site.each_context(request),
+            'progress': progress,
+            'done': progress['queued'] + progress['sending'] == 0,
+            'batch': batch,
+            'title': 'Email Delivery Progress',
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/email_batch_progress.html', context)
 
 @admin.register(MentorPage)
 class MentorPageAdmin(admin.ModelAdmin):
@@ -27,26 +111,32 @@ class MentorPageAdmin(admin.ModelAdmin):
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('user_name', 'user_email', 'mentor', 'status', 'created_at', 'admin_actions')
+    # mentor is nullable, so the changelist's automatic select_related() skips it
+    list_select_related = ('mentor',)
     list_filter = ('status', 'mentor', 'created_at')
     search_fields = ('user_name', 'user_email', 'question_text')
-    readonly_fields = ('created_at', 'updated_at', 'assigned_at', 'answered_at', 'approved_at', 'sent_at')
-    actions = ['send_to_mentors', 'approve_answers', 'send_to_users']
+    readonly_fields = ('created_at', 'updated_at', 'assigned_at', 'answered_at', 'approved_at', 'sent_at',
+                       'mentor_email_status', 'user_email_status', 'similar_answered_questions')
+    actions = ['send_to_mentors', 'auto_assign', 'approve_answers', 'send_to_users', 'export_csv', 'export_jsonl']
     
     fieldsets = (
         ('User Information', {
             'fields': ('user_name', 'user_email', 'question_text', 'status')
         }),
         ('Mentor Assignment', {
-            'fields': ('mentor', 'assigned_at')
+            'fields': ('mentor', 'assigned_at', 'mentor_email_status')
         }),
         ('Answer', {
             'fields': ('answer_text', 'answered_at')
         }),
+        ('Similar Answered Questions', {
+            'fields': ('similar_answered_questions',)
+        }),
         ('Approval', {
             'fields': ('approved_at',)
         }),
         ('Delivery', {
-            'fields': ('sent_at',)
+            'fields': ('user_email_status', 'sent_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -87,49 +177,147 @@ class QuestionAdmin(admin.ModelAdmin):
         return ''
     admin_actions.short_description = 'Actions'
     
+    def similar_answered_questions(self, obj):
+        """Approved and sent answers to questions like this one, to reuse or spot a duplicate"""
+        if obj is None or obj.pk is None:
+            return '-'
+        matches = similar_answers(obj.question_text, exclude=obj.pk)
+        if not matches:
+            return "No similar answered questions in the index."
+        return format_html_join(
+            '',
+            '<div style="margin-bottom: 12px;"><a href="{}">{}</a> &middot; {}% match &middot; answered by {}'
+            '<blockquote style="margin: 4px 0 0 12px; white-space: pre-wrap;">{}</blockquote></div>',
+            (
+                (
+                    reverse(f'admin:mentors_{match.question._meta.model_name}_change', args=[match.question.pk]),
+                    match.question.question_text[:200],
+                    round(match.score * 100),
+                    match.question.mentor.name if match.question.mentor else 'no longer listed',
+                    match.question.answer_text,
+                )
+                for match in matches
+            ),
+        )
+    similar_answered_questions.short_description = 'Previously answered'
+    
     def send_to_mentors(self, request, queryset):
-        """Action to send questions to mentors"""
-        sent_count = 0
-        for question in queryset.filter(status='pending'):
-            if question.mentor:
-                if question.send_to_mentor(request):
-                    question.status = 'assigned'
-                    question.assigned_at = timezone.now()
-                    question.save()
-                    sent_count += 1
-                else:
-                    self.message_user(request, f"Failed to send question to {question.mentor.name}", level='error')
-            else:
-                self.message_user(request, f"Question from {question.user_name} has no mentor assigned", level='warning')
+        """Queue selected pending questions for their mentors in a handful of queries"""
+        pending = queryset.filter(status='pending')
+        ready = pending.filter(mentor__isnull=False).exclude(mentor__email='')
+        batch = new_batch()
+        with transaction.atomic():
+            # Locked first: only rows this transaction moves get an email,
+            # not ones a concurrent assign or a second click got to
+            questions = list(ready.select_for_update(of=('self',)).select_related('mentor'))
+            Question.objects.filter(pk__in=[question.pk for question in questions]).transition(
+                'assign', mentor_email_status='queued',
+            )
+            sent_count = enqueue_many(
+                EmailJob(
+                    kind=EmailJob.KIND_MENTOR,
+                    question=question,
+                    to_email=question.mentor.email,
+                    subject=subject,
+                    body=body,
+                    batch=batch,
+                )
+                for question in questions
+                for subject, body in [question.mentor_message()]
+            )
         
+        skipped = pending.count()
+        if skipped:
+            self.message_user(request, f"{skipped} pending questions have no mentor with an email address", level='warning')
         if sent_count > 0:
-            self.message_user(request, f"Successfully sent {sent_count} questions to mentors.")
+            self.message_user(request, f"Queued {sent_count} questions for delivery to mentors.")
+            return HttpResponseRedirect(reverse('admin:mentors_emailjob_batch', args=[batch]))
     send_to_mentors.short_description = "Send selected questions to mentors"
     
+    def auto_assign(self, request, queryset):
+        """Route selected pending questions by expertise and load, then queue their emails"""
+        batch = new_batch()
+        assigned, skipped = assign_pending(queryset, batch=batch)
+        if skipped:
+            self.message_user(request, f"{skipped} questions were left pending: no mentor with an email address has room.", level='warning')
+        if assigned > 0:
+            self.message_user(request, f"Assigned {assigned} questions; emails queued.")
+            return HttpResponseRedirect(reverse('admin:mentors_emailjob_batch', args=[batch]))
+        self.message_user(request, "No pending questions were assigned.", level='warning')
+    auto_assign.short_description = "Auto-assign selected questions to the best-matching mentors"
+    
     def approve_answers(self, request, queryset):
         """Approve selected answers"""
-        updated_count = queryset.update(status='approved', approved_at=timezone.now())
+        skipped = queryset.exclude(status='answered').count()
+        updated_count = queryset.transition('approve')
         self.message_user(request, f"Approved {updated_count} answers.")
+        if skipped:
+            self.message_user(request, f"Skipped {skipped} questions that were not awaiting approval.", level='warning')
     approve_answers.short_description = "Approve selected answers"
     
     def send_to_users(self, request, queryset):
-        """Send approved answers to users"""
-        sent_count = 0
-        for question in queryset.filter(status='approved'):
-            if question.send_to_user():
-                sent_count += 1
-            else:
-                self.message_user(request, f"Failed to send answer to {question.user_name}", level='error')
+        """Queue approved answers for their users in a handful of queries"""
+        ready = queryset.filter(status='approved').exclude(user_email_status='queued')
+        batch = new_batch()
+        with transaction.atomic():
+            # Locked first, like send_to_mentors: a second click waits here
+            # and then finds these rows queued already
+            questions = list(ready.select_for_update(of=('self',)).select_related('mentor'))
+            by_status = defaultdict(list)
+            for question in questions:
+                by_status[question.user_email_status].append(question.pk)
+            # Each row moves only from the status it was read with, so the
+            # jobs below match the rows marked queued exactly
+            claimed = sum(
+                Question.objects.filter(pk__in=pks, status='approved', user_email_status=old).update(
+                    user_email_status='queued',
+                )
+                for old, pks in by_status.items()
+            )
+            if claimed != len(questions):
+                transaction.set_rollback(True)
+                self.message_user(request, "Some answers changed meanwhile; nothing was queued, try again.", level='warning')
+                return None
+            sent_count = enqueue_many(
+                EmailJob(
+                    kind=EmailJob.KIND_USER,
+                    question=question,
+                    to_email=question.user_email,
+                    subject=subject,
+                    body=body,
+                    batch=batch,
+                )
+                for question in questions
+                for subject, body in [question.answer_message()]
+            )
         
-        self.message_user(request, f"Successfully sent {sent_count} answers to users.")
+        self.message_user(request, f"Queued {sent_count} answers for delivery to users.")
+        if sent_count > 0:
+            return HttpResponseRedirect(reverse('admin:mentors_emailjob_batch', args=[batch]))
     send_to_users.short_description = "Send approved answers to users"
     
+    def export_csv(self, request, queryset):
+        """Stream the selected questions as CSV"""
+        return streaming_response(export_queryset(queryset), 'csv')
+    export_csv.short_description = "Export selected questions as CSV"
+    
+    def export_jsonl(self, request, queryset):
+        """Stream the selected questions as JSON lines"""
+        return streaming_response(export_queryset(queryset), 'jsonl')
+    export_jsonl.short_description = "Export selected questions as JSON lines"
+    
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'status_totals': cached_status_totals(), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+    
     # Custom views for specific actions
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('<path:object_id>/assign/', self.admin_site.admin_view(self.assign_to_mentor), name='assign_to_mentor'),
             path('<path:object_id>/send-to-user/', self.admin_site.admin_view(self.send_to_user_view), name='send_to_user'),
+            path('export/<str:fmt>/', self.admin_site.admin_view(self.export_view), name='mentors_question_export'),
+            path('sla/', self.admin_site.admin_view(self.sla_view), name='mentors_question_sla'),
         ]
         return custom_urls + urls
     
@@ -143,37 +331,86 @@ class QuestionAdmin(admin.ModelAdmin):
                 mentor = get_object_or_404(Mentor, id=mentor_id)
                 question.mentor = mentor
                 
-                # Send question to mentor
+                # Fails if someone got there first
                 if question.send_to_mentor(request):
-                    question.status = 'assigned'
-                    question.assigned_at = timezone.now()
-                    question.save()
-                    self.message_user(request, f"Question assigned to {mentor.name} and email sent successfully.")
+                    self.message_user(request, f"Question assigned to {mentor.name}; email queued.")
+                elif not mentor.email:
+                    self.message_user(request, f"{mentor.name} has no email address", level='error')
                 else:
-                    self.message_user(request, f"Failed to send email to {mentor.name}", level='error')
+                    self.message_user(request, "This question is no longer pending.", level='warning')
                 
                 return HttpResponseRedirect(reverse('admin:mentors_question_changelist'))
         
         # Show mentor selection form
         from django.template.response import TemplateResponse
+        suggested = None
+        if question.status == 'pending':
+            suggested = MentorIndex.build().suggest(question.question_text)
         context = {
             'question': question,
             'mentors': Mentor.objects.filter(is_active=True),
+            'suggested': suggested,
             'title': 'Assign Question to Mentor',
             'opts': self.model._meta,
         }
         return TemplateResponse(request, 'admin/assign_to_mentor.html', context)
     
+    def export_view(self, request, fmt):
+        """Stream every question the changelist filters in the query string match"""
+        if fmt not in FORMATS:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return streaming_response(export_queryset(changelist.get_queryset(request)), fmt)
+    
+    def sla_view(self, request):
+        """Workflow latency per stage and mentor, from the rollup of `manage.py rollup_stats`"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        from django.template.response import TemplateResponse
+        days = request.GET.get('days', '30')
+        days = int(days) if days in SLA_PERIODS else 30
+        context = {
+            **self.admin_site.each_context(request),
+            **dashboard(days),
+            'days': days,
+            'periods': SLA_PERIODS,
+            'title': 'Question Workflow SLA',
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/mentors/question/sla_dashboard.html', context)
+    
     def send_to_user_view(self, request, object_id):
         """Custom view to send answer to user"""
         question = get_object_or_404(Question, id=object_id)
         
         if question.status == 'approved':
-            if question.send_to_user():
-                self.message_user(request, "Answer sent to user successfully.")
+            with transaction.atomic():
+                queued = question.send_to_user()
+            if queued:
+                self.message_user(request, "Answer queued for delivery to the user.")
             else:
-                self.message_user(request, "Failed to send answer to user.", level='error')
+                self.message_user(request, "This answer is already queued for delivery.", level='warning')
         else:
             self.message_user(request, "Only approved answers can be sent to users.", level='warning')
         
-        return HttpResponseRedirect(reverse('admin:mentors_question_changelist'))
\ No newline at end of file
+        return HttpResponseRedirect(reverse('admin:mentors_question_changelist'))
+
+
+@admin.register(ArchivedQuestion)
+class ArchivedQuestionAdmin(admin.ModelAdmin):
+    """Read-only view of questions moved out by `manage.py archive_questions`"""
+    list_display = ('user_name', 'user_email', 'mentor', 'status', 'created_at', 'archived_at')
+    list_select_related = ('mentor',)
+    list_filter = ('status', 'mentor', 'created_at')
+    search_fields = ('user_name', 'user_email', 'question_text')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,130 @@
+"""
+Moving finished questions out of the hot Question table.
+
+Sent and rejected questions asked, and last moved, more than
+ARCHIVE_AFTER_DAYS ago are copied into ArchivedQuestion and deleted from Question, a bounded batch per
+transaction, walking forward by primary key. Both statuses are final, so a
+row picked for a batch can't change before it is deleted. Totals that
+should cover all time go through status_totals()/totals_by_mentor(),
+which add the two tables together.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedQuestion, Question
+
+ARCHIVED_STATUSES = ('sent', 'rejected')
+STATUS_TOTALS_KEY = 'mentors:status-totals'
+
+
+def cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+# Stage timestamps the daily rollup (mentors.rollup) reads
+STAGE_FIELDS = ('assigned_at', 'answered_at', 'approved_at', 'sent_at')
+
+
+def archivable(before):
+    """
+    Finished questions asked before `before` that reached no stage since.
+
+    A question asked long ago but sent only recently stays until its sent
+    day is old too, so the rollup's regular passes, which read only the
+    live table, still see every sample of the days they recompute.
+    """
+    recent = Q()
+    for field in STAGE_FIELDS:
+        recent |= Q(**{f'{field}__gte': before})
+    return Question.objects.filter(status__in=ARCHIVED_STATUSES, created_at__lt=before).exclude(recent)
+
+
+def archive_batch(before, after_pk=0, batch_size=1000):
+    """
+    Archive the next batch of questions with a pk above after_pk.
+
+    Returns (moved, last pk looked at), or (0, None) when nothing is left.
+    """
+    with transaction.atomic():
+        batch = list(
+            archivable(before).filter(pk__gt=after_pk).select_for_update()
+            .only(*ArchivedQuestion.COPIED_FIELDS).order_by('pk')[:batch_size]
+        )
+        if not batch:
+            return 0, None
+        first, last = batch[0].pk, batch[-1].pk
+        ArchivedQuestion.objects.bulk_create([ArchivedQuestion.from_question(question) for question in batch])
+        # Delete exactly the rows copied above, found through the pk range.
+        # Re-running archivable() here could pick up a row in the range that
+        # qualified only after the read, and delete it without a copy.
+        # Email jobs of the deleted rows are kept, unlinked (SET_NULL)
+        Question.objects.filter(pk__gte=first, pk__lte=last, pk__in=[question.pk for question in batch]).delete()
+        return len(batch), last
+
+
+def archive_questions(before, batch_size=1000, pause=0.0):
+    """Archive everything eligible, one transaction per batch; returns how many moved"""
+    total = 0
+    after_pk = 0
+    while True:
+        moved, after_pk = archive_batch(before, after_pk, batch_size)
+        if after_pk is None:
+            return total
+        total += moved
+        if pause:
+            # Let other writers in between batches
+            time.sleep(pause)
+
+
+def status_totals(mentor=None):
+    """Questions per status, live and archived, in two grouped queries"""
+    totals = dict.fromkeys(dict(Question.STATUS_CHOICES), 0)
+    for model in (Question, ArchivedQuestion):
+        rows = model.objects.all()
+        if mentor is not None:
+            rows = rows.filter(mentor=mentor)
+        for status, n in rows.values_list('status').annotate(n=Count('id')).order_by():
+            totals[status] += n
+    totals['total'] = sum(totals.values())
+    return totals
+
+
+def cached_status_totals():
+    """
+    status_totals() as counted at most STATUS_TOTALS_CACHE_SECONDS ago.
+
+    It scans every question, live and archived, so the admin question list
+    doesn't run it on every load.
+    """
+    totals = cache.get(STATUS_TOTALS_KEY)
+    if totals is None:
+        totals = status_totals()
+        cache.set(STATUS_TOTALS_KEY, totals, timeout=settings.STATUS_TOTALS_CACHE_SECONDS)
+    return totals
+
+
+def _count_per_mentor(model, statuses):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(mentor=OuterRef('pk'), status__in=statuses)
+            .order_by().values('mentor').annotate(n=Count('id')).values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def totals_by_mentor(queryset, name, statuses):
+    """Annotate mentors with their live plus archived questions in the given statuses"""
+    return queryset.annotate(**{
+        name: _count_per_mentor(Question, statuses) + _count_per_mentor(ArchivedQuestion, statuses),
+    })
@@ -0,0 +1,181 @@
+"""
+Automatic routing of pending questions to mentors.
+
+Active mentors with an email address are loaded once into an inverted
+index (term -> mentor weights) built from their expertise, department and
+bio, plus their open load: how many questions they hold in ``assigned``.
+Each question then only touches the postings of its own terms, so a run
+costs roughly mentors + questions rather than questions x mentors.
+
+A question goes to the mentor with the best ``relevance / (1 + load)``.
+Questions that match nobody go to the least loaded mentor, and mentors at
+ASSIGNMENT_MAX_OPEN open questions get nothing more. Questions asked to a
+specific mentor keep that mentor.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import EmailJob, Mentor, Question
+from .outbox import enqueue_many
+from .search import normalize
+
+# Expertise says most about what a mentor can answer, the bio least
+FIELD_WEIGHTS = (('expertise', 3.0), ('department', 2.0), ('bio', 1.0))
+# Shorter words are mostly particles and prepositions
+MIN_TERM_LENGTH = 3
+# Terms found in more than this share of mentors are treated as stop words
+MAX_TERM_SHARE = 0.5
+
+
+def terms(text):
+    return {term for term in normalize(text).split() if len(term) >= MIN_TERM_LENGTH}
+
+
+class MentorIndex:
+    def __init__(self, mentors, loads, max_open=None):
+        self.mentors = {mentor.pk: mentor for mentor in mentors}
+        self.loads = {pk: loads.get(pk, 0) for pk in self.mentors}
+        self.max_open = max_open
+        postings = defaultdict(dict)
+        for mentor in self.mentors.values():
+            for field, weight in FIELD_WEIGHTS:
+                for term in terms(getattr(mentor, field)):
+                    if postings[term].get(mentor.pk, 0) < weight:
+                        postings[term][mentor.pk] = weight
+        total = len(self.mentors)
+        self.postings = {}
+        for term, weights in postings.items():
+            if len(weights) > max(1, total * MAX_TERM_SHARE):
+                continue
+            idf = math.log(1 + total / len(weights))
+            self.postings[term] = [(pk, weight * idf) for pk, weight in weights.items()]
+        # (load, id); entries go stale as loads grow and are fixed up on pop
+        self._by_load = [(load, pk) for pk, load in self.loads.items()]
+        heapq.heapify(self._by_load)
+
+    @classmethod
+    def build(cls, max_open=None):
+        """Two queries: the mentors and their open load"""
+        if max_open is None:
+            max_open = settings.ASSIGNMENT_MAX_OPEN
+        mentors = Mentor.objects.filter(is_active=True).exclude(email='').only(
+            'id', 'name', 'email', 'is_active', 'department', 'expertise', 'bio',
+        )
+        loads = dict(
+            Question.objects.filter(status='assigned', mentor__isnull=False)
+            .values_list('mentor').annotate(n=Count('id')).order_by()
+        )
+        return cls(mentors, loads, max_open or None)
+
+    def has_room(self, pk):
+        return self.max_open is None or self.loads[pk] < self.max_open
+
+    def least_loaded(self):
+        while self._by_load:
+            load, pk = self._by_load[0]
+            if load != self.loads[pk]:
+                heapq.heapreplace(self._by_load, (self.loads[pk], pk))
+            elif self.has_room(pk):
+                return self.mentors[pk]
+            else:
+                # Loads only grow during a run, so a full mentor stays full
+                heapq.heappop(self._by_load)
+        return None
+
+    def suggest(self, text):
+        """The mentor the text should go to, or None when everyone is full"""
+        scores = defaultdict(float)
+        for term in terms(text):
+            for pk, weight in self.postings.get(term, ()):
+                scores[pk] += weight
+        best = None
+        for pk, relevance in scores.items():
+            if not self.has_room(pk):
+                continue
+            rank = (relevance / (1 + self.loads[pk]), -self.loads[pk], -pk)
+            if best is None or rank > best[0]:
+                best = (rank, pk)
+        if best is not None:
+            return self.mentors[best[1]]
+        return self.least_loaded()
+
+    def route(self, question):
+        """Pick a mentor for a pending question and count it against their load"""
+        if question.mentor_id is not None:
+            # Asked to this mentor; skipped if they can't be emailed
+            mentor = self.mentors.get(question.mentor_id)
+        else:
+            mentor = self.suggest(question.question_text)
+        if mentor is not None:
+            self.loads[mentor.pk] += 1
+            heapq.heappush(self._by_load, (self.loads[mentor.pk], mentor.pk))
+        return mentor
+
+
+def assign_pending(queryset=None, batch='', max_open=None, dry_run=False, chunk_size=500):
+    """
+    Route and assign pending questions, oldest first; returns (assigned, left pending).
+
+    With dry_run nothing is written and the first item is the list of
+    (question, mentor) pairs that would have been assigned.
+
+    Every chunk is written in one transaction: the mentors of unrouted
+    questions in one bulk UPDATE, the status change through the usual
+    'assign' transition and the mentor emails through the outbox.
+    """
+    index = MentorIndex.build(max_open)
+    pending = (queryset if queryset is not None else Question.objects.all()).filter(status='pending')
+    pending = pending.only('id', 'user_name', 'question_text', 'mentor_id').order_by('created_at', 'id')
+    plan = []
+    skipped = 0
+    # Route everything before writing anything; the writes never race the read cursor
+    for question in pending.iterator(chunk_size=chunk_size):
+        mentor = index.route(question)
+        if mentor is None:
+            skipped += 1
+        else:
+            plan.append((question, mentor))
+    if dry_run:
+        return plan, skipped
+    assigned = sum(_apply(plan[i:i + chunk_size], batch) for i in range(0, len(plan), chunk_size))
+    return assigned, skipped
+
+
+def _apply(chunk, batch):
+    with transaction.atomic():
+        # Rows assigned or re-pointed since the routing pass are left alone
+        current = dict(
+            Question.objects.select_for_update()
+            .filter(pk__in=[question.pk for question, _ in chunk], status='pending')
+            .values_list('pk', 'mentor_id')
+        )
+        chunk = [
+            (question, mentor) for question, mentor in chunk
+            if question.pk in current and current[question.pk] == question.mentor_id
+        ]
+        routed = []
+        for question, mentor in chunk:
+            if question.mentor_id is None:
+                routed.append(question)
+            question.mentor = mentor
+        if routed:
+            Question.objects.bulk_update(routed, ['mentor'])
+        rows = Question.objects.filter(pk__in=[question.pk for question, _ in chunk])
+        rows.transition('assign', mentor_email_status='queued')
+        return enqueue_many(
+            EmailJob(
+                kind=EmailJob.KIND_MENTOR,
+                question=question,
+                to_email=mentor.email,
+                subject=subject,
+                body=body,
+                batch=batch,
+            )
+            for question, mentor in chunk
+            for subject, body in [question.mentor_message()]
+        )
@@ -0,0 +1,122 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Value
+
+from core import metrics
+
+VERSION_KEY = 'mentors:version'
+
+
+def _timeout():
+    return getattr(settings, 'MENTOR_CACHE_TIMEOUT', 300)
+
+
+def _stamp(rows):
+    """
+    Version from (newest updated_at, row count) per model.
+
+    Adding the counts makes a delete change the stamp too. The result is the
+    same in every process and survives restarts, so each worker hands out
+    the same ETag for the same content.
+    """
+    latest = [newest for newest, _ in rows if newest is not None]
+    base = int(max(latest).timestamp() * 1000) if latest else 0
+    return base + sum(count for _, count in rows)
+
+
+def _version_rows():
+    """(newest updated_at, count) of Mentor and of MentorPage, in one query"""
+    from .models import Mentor, MentorPage
+    mentors, pages = (
+        model.objects.order_by().annotate(one=Value(1)).values('one')
+        .annotate(newest=Max('updated_at'), count=Count('id')).values_list('newest', 'count')
+        for model in (Mentor, MentorPage)
+    )
+    return mentors.union(pages, all=True)
+
+
+def stored_version():
+    return _stamp(list(_version_rows()))
+
+
+async def astored_version():
+    return _stamp([row async for row in _version_rows()])
+
+
+def content_version():
+    """
+    Stamp of the last Mentor/MentorPage change seen by this cache.
+
+    On a miss it is read back from the updated_at columns. The cached stamp
+    expires after MENTOR_CACHE_TIMEOUT, which bounds how stale a per-process
+    cache can get when another worker did the bump.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        seed = stored_version()
+        cache.add(VERSION_KEY, seed, timeout=_timeout())
+        version = cache.get(VERSION_KEY) or seed
+    return version
+
+
+async def acontent_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        seed = await astored_version()
+        await cache.aadd(VERSION_KEY, seed, timeout=_timeout())
+        version = await cache.aget(VERSION_KEY) or seed
+    return version
+
+
+def bump_version():
+    # Never step back, even when a delete lowers the stored stamp
+    version = max(stored_version(), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, timeout=_timeout())
+    return version
+
+
+def _digest(parts):
+    return hashlib.md5('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def versioned_key(name, *parts):
+    return f'mentors:{content_version()}:{name}:{_digest(parts)}'
+
+
+def _count(name, hit):
+    metrics.registry.inc("bloo_cache_requests_total", (("cache", name), ("result", "hit" if hit else "miss")))
+
+
+def get_or_render(name, parts, render):
+    """Return cached bytes for (name, parts) at the current version, rendering on a miss"""
+    key = versioned_key(name, *parts)
+    content = cache.get(key)
+    _count(name, content is not None)
+    if content is None:
+        content = render()
+        cache.set(key, content, timeout=_timeout())
+    return content
+
+
+async def aget_or_render(name, parts, render):
+    """get_or_render for async views; render is a coroutine function"""
+    key = f'mentors:{await acontent_version()}:{name}:{_digest(parts)}'
+    content = await cache.aget(key)
+    _count(name, content is not None)
+    if content is None:
+        content = await render()
+        await cache.aset(key, content, timeout=_timeout())
+    return content
+
+
+async def alast_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(await acontent_version() / 1000, tz=timezone.utc)
+
+
+async def aetag(request, *args, **kwargs):
+    variant = 'xhr' if request.headers.get('X-Requested-With') == 'XMLHttpRequest' else 'html'
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:8]
+    return f'{await acontent_version()}-{variant}-{query}'
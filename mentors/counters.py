@@ -0,0 +1,39 @@
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Mentor, Question
+
+
+def adjust_pending(old, new):
+    """
+    Move the pending counter between mentors for one question.
+
+    old and new are (mentor_id, status) before and after the change.
+    """
+    if old == new:
+        return
+    old_mentor, old_status = old
+    new_mentor, new_status = new
+    if old_mentor and old_status == 'pending':
+        Mentor.objects.filter(pk=old_mentor, pending_questions__gt=0).update(
+            pending_questions=F('pending_questions') - 1,
+        )
+    if new_mentor and new_status == 'pending':
+        Mentor.objects.filter(pk=new_mentor).update(pending_questions=F('pending_questions') + 1)
+
+
+def refresh_pending(mentors=None):
+    """
+    Recount pending questions in one UPDATE, for bulk updates that skip signals.
+
+    mentors is a Mentor queryset, an iterable of ids, or None for everyone.
+    """
+    if mentors is None:
+        mentors = Mentor.objects.all()
+    elif not isinstance(mentors, QuerySet):
+        mentors = Mentor.objects.filter(pk__in=list(mentors))
+    pending = (
+        Question.objects.filter(mentor=OuterRef('pk'), status='pending')
+        .order_by().values('mentor').annotate(n=Count('id')).values('n')
+    )
+    return mentors.update(pending_questions=Coalesce(Subquery(pending), Value(0)))
@@ -0,0 +1,114 @@
+"""
+Streaming CSV/JSONL export of questions with their mentor.
+
+Rows come off a ``.iterator()`` cursor and are encoded one at a time, so
+an export of any size runs in constant memory, and a
+StreamingHttpResponse starts sending before the last row is read.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Question
+
+# (column, attribute path on a Question)
+COLUMNS = [
+    ('id', 'pk'),
+    ('created_at', 'created_at'),
+    ('status', 'status'),
+    ('user_name', 'user_name'),
+    ('user_email', 'user_email'),
+    ('question_text', 'question_text'),
+    ('answer_text', 'answer_text'),
+    ('mentor_id', 'mentor_id'),
+    ('mentor_name', 'mentor.name'),
+    ('mentor_university', 'mentor.university'),
+    ('mentor_department', 'mentor.department'),
+    ('assigned_at', 'assigned_at'),
+    ('answered_at', 'answered_at'),
+    ('approved_at', 'approved_at'),
+    ('sent_at', 'sent_at'),
+]
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+# Cells starting with these run as formulas in spreadsheet apps
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_queryset(queryset=None, status=None, mentor=None, since=None, until=None):
+    """Questions matching the changelist filters, with only the exported fields loaded"""
+    if queryset is None:
+        queryset = Question.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if mentor:
+        queryset = queryset.filter(mentor=mentor)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    fields = [path.replace('.', '__') for _, path in COLUMNS if path != 'pk']
+    return queryset.select_related('mentor').only(*fields).order_by('pk')
+
+
+def _value(question, path):
+    value = question
+    for attr in path.split('.'):
+        value = getattr(value, attr)
+        if value is None:
+            return None
+    return value
+
+
+def rows(queryset, chunk_size=CHUNK_SIZE):
+    for question in queryset.iterator(chunk_size=chunk_size):
+        yield [_value(question, path) for _, path in COLUMNS]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller"""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in COLUMNS])
+    for row in rows(queryset, chunk_size):
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def jsonl_lines(queryset, chunk_size=CHUNK_SIZE):
+    columns = [column for column, _ in COLUMNS]
+    for row in rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def lines(queryset, fmt, chunk_size=CHUNK_SIZE):
+    return (csv_lines if fmt == 'csv' else jsonl_lines)(queryset, chunk_size)
+
+
+def streaming_response(queryset, fmt):
+    response = StreamingHttpResponse(
+        (line.encode() for line in lines(queryset, fmt)),
+        content_type=FORMATS[fmt],
+    )
+    filename = f"questions-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
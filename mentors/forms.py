@@ -19,4 +19,13 @@ class QuestionForm(forms.ModelForm):
                 'placeholder': 'Your question for our mentors...',
                 'rows': 4
             }),
-        }
\ No newline at end of file
+        }
+
+class AnswerForm(forms.Form):
+    answer_text = forms.CharField(
+        widget=forms.Textarea(attrs={
+            'class': 'w-full px-4 py-2 border rounded-lg focus:ring-2 focus:ring-purple-600 focus:border-transparent',
+            'placeholder': 'Your answer...',
+            'rows': 8
+        }),
+    )
@@ -0,0 +1,93 @@
+"""
+Write-path guard for ask_question.
+
+Runs after the form validates and before anything is saved. A
+resubmission of the same question is dropped by an indexed lookup on
+Question.content_hash. Everything else is counted against the
+QUESTION_QUOTAS policies, keyed on client IP and on the asker's email,
+once all of them have been checked and would let it through.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import metrics
+from core.ratelimit import Policy, get_limiter
+
+from .models import Question
+from .search import normalize
+
+
+class Screening(NamedTuple):
+    content_hash: str
+    duplicate: bool
+    retry_after: int
+
+    @property
+    def allowed(self):
+        return not self.duplicate and not self.retry_after
+
+
+@functools.cache
+def _limiter():
+    return get_limiter()
+
+
+@receiver(setting_changed)
+def _reset_limiter(setting, **kwargs):
+    if setting.startswith('RATE_LIMIT_'):
+        _limiter.cache_clear()
+
+
+def content_hash(email, text, mentor_id=None):
+    """Same asker, same mentor and the same words modulo case/spacing/accents"""
+    raw = '\x1f'.join([email.strip().casefold(), normalize(text), str(mentor_id or '')])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def quota_policies():
+    """(identity kind, Policy) pairs from QUESTION_QUOTAS"""
+    return [
+        (conf['key'], Policy(f"question-{conf['key']}-{conf['window']}", conf['limit'], conf['window']))
+        for conf in getattr(settings, 'QUESTION_QUOTAS', [])
+    ]
+
+
+def is_duplicate(digest):
+    window = getattr(settings, 'QUESTION_DUPLICATE_WINDOW', 24 * 60 * 60)
+    since = timezone.now() - timedelta(seconds=window)
+    return Question.objects.filter(content_hash=digest, created_at__gte=since).exists()
+
+
+def screen(ip, email, text, mentor_id=None):
+    """Decide whether a valid submission may be saved; duplicates do not use up quota"""
+    digest = content_hash(email, text, mentor_id)
+    if is_duplicate(digest):
+        return Screening(digest, True, 0)
+    identities = {'ip': ip, 'email': email.strip().casefold()}
+    quotas = [(policy, identities[key]) for key, policy in quota_policies()]
+    limiter = _limiter()
+    # Check every quota before counting against any, so a refused question
+    # doesn't use up the quotas that would have let it through
+    for policy, identity in quotas:
+        result = limiter.check(policy, identity)
+        if not result.allowed:
+            return _refused(digest, policy, result)
+    # Concurrent submissions can still pass the check together; the hits
+    # below catch those, at the cost of the quotas counted before
+    for policy, identity in quotas:
+        result = limiter.hit(policy, identity)
+        if not result.allowed:
+            return _refused(digest, policy, result)
+    return Screening(digest, False, 0)
+
+
+def _refused(digest, policy, result):
+    metrics.registry.inc("bloo_ratelimit_rejections_total", (("policy", policy.name),))
+    return Screening(digest, False, result.retry_after)
@@ -0,0 +1,108 @@
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+# Square card avatars are 48-80 CSS px; 240 covers 3x screens
+CARD_WIDTHS = (80, 160, 240)
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 6}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+VARIANT_DIR = 'mentors/profile_photos/variants'
+# What Pillow raises on an upload it can't or won't decode: unreadable or
+# truncated files, corrupt headers, and images too large to open safely
+UNREADABLE = (OSError, ValueError, EOFError, SyntaxError, Image.DecompressionBombError)
+
+
+def render_variants(image):
+    """Yield (format, width, bytes) for every card size of a PIL image"""
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    for width in CARD_WIDTHS:
+        resized = ImageOps.fit(image, (width, width), method=Image.LANCZOS)
+        for fmt, pil_format, options in FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            yield fmt, width, buffer.getvalue()
+
+
+def build_variants(name, storage=default_storage):
+    """
+    Write the resized variants of an uploaded photo and describe them.
+
+    Files are named after a hash of their own bytes, so a URL never
+    changes meaning and can be cached as immutable.
+    """
+    with storage.open(name, 'rb') as fh:
+        image = Image.open(fh)
+        image.load()
+    variants = []
+    for fmt, width, data in render_variants(image):
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        target = posixpath.join(VARIANT_DIR, f'{digest}-{width}.{fmt}')
+        if not storage.exists(target):
+            storage.save(target, ContentFile(data))
+        variants.append({'format': fmt, 'width': width, 'height': width, 'name': target, 'bytes': len(data)})
+    return {'source': name, 'variants': variants}
+
+
+def photo_sources(name, variants, storage=default_storage):
+    """
+    What a card needs to show a photo: src, srcset per format and the
+    intrinsic size. Falls back to the original upload until the variants
+    have been built.
+    """
+    if not name:
+        return None
+    by_format = {}
+    if variants and variants.get('source') == name:
+        for variant in variants.get('variants') or []:
+            by_format.setdefault(variant['format'], []).append(variant)
+    jpeg = sorted(by_format.get('jpeg', []), key=lambda v: v['width'])
+    webp = sorted(by_format.get('webp', []), key=lambda v: v['width'])
+    # The JPEG set is the fallback every browser can show; without one,
+    # serve the upload itself
+    if not jpeg:
+        return {'src': storage.url(name), 'srcset': '', 'webp_srcset': '', 'width': None, 'height': None}
+
+    def srcset(items):
+        return ', '.join(f"{storage.url(v['name'])} {v['width']}w" for v in items)
+
+    smallest = jpeg[0]
+    return {
+        'src': storage.url(smallest['name']),
+        'srcset': srcset(jpeg),
+        'webp_srcset': srcset(webp),
+        'width': smallest['width'],
+        'height': smallest['height'],
+    }
+
+
+def process_pending(batch_size=50):
+    """Build variants for mentors whose photo changed; returns how many were done"""
+    from .caching import bump_version
+    from .models import Mentor
+
+    pending = (
+        Mentor.objects.filter(photo_variants__isnull=True)
+        .exclude(profile_photo='').exclude(profile_photo__isnull=True)
+        .values_list('pk', 'profile_photo')[:batch_size]
+    )
+    done = 0
+    for pk, name in pending:
+        try:
+            data = build_variants(name)
+        except UNREADABLE as exc:
+            # Unreadable upload: record it so the worker does not retry forever
+            data = {'source': name, 'variants': [], 'error': str(exc)}
+        # Only store the result if the photo was not replaced meanwhile
+        done += Mentor.objects.filter(pk=pk, profile_photo=name).update(
+            photo_variants=data, updated_at=timezone.now(),
+        )
+    if done:
+        bump_version()
+    return done
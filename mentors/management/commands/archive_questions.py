@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentors.archive import archivable, archive_questions, cutoff
+
+
+class Command(BaseCommand):
+    help = "Move sent/rejected questions older than ARCHIVE_AFTER_DAYS into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Age in days (default ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Questions per transaction")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument('--loop', action='store_true', help="Keep running, one pass per interval")
+        parser.add_argument('--interval', type=float, default=24 * 60 * 60, help="Seconds between passes with --loop")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived")
+
+    def handle(self, *args, **options):
+        while True:
+            before = cutoff(options['days'])
+            if options['dry_run']:
+                count = archivable(before).count()
+                self.stdout.write(f"{count} question(s) created before {before:%Y-%m-%d} would be archived.")
+                return
+            total = archive_questions(before, options['batch_size'], options['pause'])
+            if total:
+                self.stdout.write(f"Archived {total} question(s) created before {before:%Y-%m-%d}.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentors.assignment import assign_pending
+from mentors.outbox import new_batch
+
+
+class Command(BaseCommand):
+    help = "Route pending questions to mentors by expertise match and open load, and queue their emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running, one pass per interval")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds between passes with --loop")
+        parser.add_argument(
+            '--max-open', type=int, default=None,
+            help="Open questions per mentor before they are skipped (default ASSIGNMENT_MAX_OPEN, 0 = no cap)",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Print the assignments without saving them")
+
+    def handle(self, *args, **options):
+        while True:
+            if options['dry_run']:
+                plan, skipped = assign_pending(max_open=options['max_open'], dry_run=True)
+                for question, mentor in plan:
+                    self.stdout.write(f"#{question.pk} -> {mentor.name}")
+                assigned = len(plan)
+            else:
+                assigned, skipped = assign_pending(batch=new_batch(), max_open=options['max_open'])
+            if assigned or skipped:
+                self.stdout.write(f"Assigned {assigned} question(s); {skipped} left pending.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,67 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connections
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from mentors.models import EmailJob, Question
+
+BENCH_EMAIL = 'bench@bench.invalid'
+
+
+class Command(BaseCommand):
+    help = "Submit ask_question forms from parallel threads and report throughput and lock errors"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        database = connections['default'].settings_dict
+        self.stdout.write(
+            f"{database['ENGINE']} CONN_MAX_AGE={database['CONN_MAX_AGE']} "
+            f"OPTIONS={database['OPTIONS']}"
+        )
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'], RATE_LIMIT_BACKEND='core.ratelimit.LocMemBackend',
+        ):
+            try:
+                self._run(options['requests'], options['concurrency'])
+            finally:
+                questions = Question.objects.filter(user_email=BENCH_EMAIL)
+                EmailJob.objects.filter(question__in=questions).delete()
+                questions.delete()
+
+    def _run(self, total, concurrency):
+        url = reverse('ask_question')
+
+        def submit(i):
+            client = Client(REMOTE_ADDR=f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+            start = time.perf_counter()
+            try:
+                response = client.post(url, {
+                    'user_name': f"Bench {i}", 'user_email': BENCH_EMAIL, 'question_text': "Load test",
+                }, secure=True)
+            except OperationalError as exc:
+                return time.perf_counter() - start, str(exc)
+            return time.perf_counter() - start, None if response.status_code == 302 else response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(submit, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = [error for _, error in results if error is not None]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{total} submissions, concurrency {concurrency}: {total / elapsed:.0f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, "
+            f"{len(errors)} failed"
+        )
+        for error in sorted(set(map(str, errors))):
+            self.stdout.write(f"  {error}")
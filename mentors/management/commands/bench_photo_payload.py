@@ -0,0 +1,69 @@
+import random
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFilter
+
+from mentors.images import render_variants
+from mentors.models import Mentor
+from mentors.pagination import DEFAULT_PAGE_SIZE
+
+# What a 2x screen picks for an 80 CSS px card
+PICKED_WIDTH = 160
+
+
+class Command(BaseCommand):
+    help = "Compare image bytes per mentor_list page for original uploads vs the card variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help="Use N generated photos instead of the uploaded ones")
+        parser.add_argument('--size', type=int, default=1600, help="Edge of generated photos in px")
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            samples = [self._synthetic(i, options['size']) for i in range(options['synthetic'])]
+        else:
+            samples = list(self._uploaded())
+        if not samples:
+            self.stdout.write("No mentor photos uploaded; rerun with --synthetic N.")
+            return
+
+        self.stdout.write(f"{len(samples)} photos, {DEFAULT_PAGE_SIZE} per page, {PICKED_WIDTH}w variant picked")
+        self.stdout.write(f"{'format':<10}{'bytes/photo':>14}{'bytes/page':>14}{'saving':>10}")
+        original = sum(size for size, _ in samples) / len(samples)
+        self._row('original', original, original)
+        for fmt in ('jpeg', 'webp'):
+            avg = sum(variants[fmt] for _, variants in samples) / len(samples)
+            self._row(fmt, avg, original)
+
+    def _row(self, label, per_photo, original):
+        saving = 100 * (1 - per_photo / original)
+        self.stdout.write(f"{label:<10}{per_photo:>14.0f}{per_photo * DEFAULT_PAGE_SIZE:>14.0f}{saving:>9.1f}%")
+
+    def _picked(self, image):
+        return {fmt: len(data) for fmt, width, data in render_variants(image) if width == PICKED_WIDTH}
+
+    def _uploaded(self):
+        names = Mentor.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True)
+        for name in names.values_list('profile_photo', flat=True):
+            with default_storage.open(name, 'rb') as fh:
+                data = fh.read()
+            yield len(data), self._picked(Image.open(BytesIO(data)))
+
+    def _synthetic(self, seed, size):
+        # Soft shapes plus noise compress roughly like a phone portrait
+        rng = random.Random(seed)
+        image = Image.new('RGB', (size, size), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rng.randrange(size), rng.randrange(size)
+            r = rng.randrange(size // 20, size // 3)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+        image = image.filter(ImageFilter.GaussianBlur(size / 100))
+        noise = Image.effect_noise((size, size), 24).convert('RGB')
+        image = Image.blend(image, noise, 0.15)
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        return buffer.tell(), self._picked(image)
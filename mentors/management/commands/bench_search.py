@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from mentors.models import Mentor
+from mentors.pagination import DEFAULT_PAGE_SIZE
+from mentors.search import rebuild_index, search_mentor_ids
+
+FIRST_NAMES = ['Elnur', 'Aysel', 'Rəşad', 'Günay', 'İlkin', 'Nərmin', 'Orxan', 'Ləman', 'Tural', 'Şəbnəm']
+LAST_NAMES = ['Əliyev', 'Məmmədova', 'Hüseynov', 'Quliyeva', 'İsmayılov', 'Cəfərova', 'Həsənov', 'Şükürova']
+UNIVERSITIES = ['ADA University', 'Baku State University', 'UNEC', 'Khazar University', 'BHOS', 'ETH Zürich']
+DEPARTMENTS = ['Computer Science', 'Economics', 'Medicine', 'Law', 'Physics', 'International Relations']
+TOPICS = ['machine learning', 'scholarships', 'IELTS', 'olympiads', 'startups', 'research', 'admissions']
+
+QUERIES = ['Elnur', 'məmməd', 'ADA', 'Computer', 'iel', 'zurich', 'hus', 'olymp econ']
+
+
+class Command(BaseCommand):
+    help = "Compare full-text mentor search with the old icontains OR filter on synthetic data (rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        for size in sizes:
+            with transaction.atomic():
+                self._seed(size)
+                self._report(size, options['repeat'])
+                transaction.set_rollback(True)
+
+    def _seed(self, size):
+        rng = random.Random(size)
+        start = Mentor.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        mentors = []
+        for i in range(size):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            mentors.append(Mentor(
+                name=f"{first} {last}",
+                university=rng.choice(UNIVERSITIES),
+                department=rng.choice(DEPARTMENTS),
+                initials=f"{first[0]}{last[0]}",
+                slug=f"bench-{start + i}",
+                expertise=', '.join(rng.sample(TOPICS, 2)),
+                bio=f"{first} mentors students in {rng.choice(TOPICS)}.",
+            ))
+        Mentor.objects.bulk_create(mentors, batch_size=2000)
+        rebuild_index()
+
+    def _report(self, size, repeat):
+        active = Mentor.objects.filter(is_active=True)
+        fields = ('id', 'name', 'university', 'department', 'initials', 'gradient', 'slug', 'profile_photo')
+
+        def icontains(query):
+            return list(active.filter(
+                Q(name__icontains=query) | Q(university__icontains=query) | Q(department__icontains=query)
+            ).values(*fields)[:DEFAULT_PAGE_SIZE])
+
+        def fulltext(query):
+            ids, _ = search_mentor_ids(query)
+            return list(active.filter(id__in=ids).values(*fields))
+
+        self.stdout.write(f"\n{size} mentors, {repeat} runs per query, ms per request")
+        self.stdout.write(f"{'query':<14}{'icontains':>12}{'fulltext':>12}")
+        for query in QUERIES:
+            row = [self._time(icontains, query, repeat), self._time(fulltext, query, repeat)]
+            self.stdout.write(f"{query:<14}{row[0]:>12.2f}{row[1]:>12.2f}")
+
+    def _time(self, func, query, repeat):
+        func(query)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(query)
+        return (time.perf_counter() - start) * 1000 / repeat
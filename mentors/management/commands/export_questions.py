@@ -0,0 +1,50 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from mentors.export import CHUNK_SIZE, FORMATS, export_queryset, lines
+from mentors.models import Question
+
+
+def _moment(value):
+    """An ISO date or datetime, in the current timezone when it has none"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a date: {value!r}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Stream questions with their mentor as CSV or JSON lines, in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--status', choices=[value for value, _ in Question.STATUS_CHOICES])
+        parser.add_argument('--mentor', type=int, help="Mentor id")
+        parser.add_argument('--since', help="Created at or after this date/datetime")
+        parser.add_argument('--until', help="Created before this date/datetime")
+        parser.add_argument('--output', '-o', help="File to write (default stdout)")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = export_queryset(
+            status=options['status'],
+            mentor=options['mentor'],
+            since=options['since'] and _moment(options['since']),
+            until=options['until'] and _moment(options['until']),
+        )
+        output = options['output']
+        if not output:
+            for line in lines(queryset, options['format'], options['chunk_size']):
+                self.stdout.write(line, ending='')
+            return
+        # newline='' leaves the csv module's \r\n line endings alone
+        with open(output, 'w', encoding='utf-8', newline='') as out:
+            out.writelines(lines(queryset, options['format'], options['chunk_size']))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentors.similarity import rebuild_index, update_index
+
+
+class Command(BaseCommand):
+    help = "Index approved and sent questions for the similar-answers panel in the question admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Questions indexed per transaction")
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Re-index every question against current document frequencies (first pass only with --loop)",
+        )
+        parser.add_argument('--loop', action='store_true', help="Keep running, one pass per interval")
+        parser.add_argument('--interval', type=float, default=300.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            if rebuild:
+                indexed, dropped = rebuild_index(batch_size=options['batch_size'])
+                rebuild = False
+            else:
+                indexed, dropped = update_index(batch_size=options['batch_size'])
+            if indexed or dropped or not options['loop']:
+                self.stdout.write(f"Indexed {indexed} question(s); dropped {dropped}.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentors.images import process_pending
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG card variants for newly uploaded mentor photos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new uploads")
+        parser.add_argument('--interval', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            done = process_pending(batch_size=options['batch_size'])
+            if done:
+                self.stdout.write(f"Processed {done} photos.")
+            if not options['loop']:
+                break
+            if not done:
+                time.sleep(options['interval'])
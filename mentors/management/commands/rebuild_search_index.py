@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from mentors.models import MentorSearchDocument
+from mentors.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the mentor full-text index, e.g. after queryset.update() or bulk_create() on Mentor"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {MentorSearchDocument.objects.count()} active mentors."
+        ))
@@ -0,0 +1,32 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from mentors.rollup import update_rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily SLA rollup behind the question workflow dashboard"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help="Recent days to recompute on each pass")
+        parser.add_argument(
+            '--since', type=date.fromisoformat, default=None,
+            help="Backfill from this date (YYYY-MM-DD), archive included; first pass only with --loop",
+        )
+        parser.add_argument('--loop', action='store_true', help="Keep running, one pass per interval")
+        parser.add_argument('--interval', type=float, default=600.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        since = options['since']
+        while True:
+            first, written = update_rollup(days=options['days'], since=since)
+            since = None
+            if first is None:
+                self.stdout.write("No questions to roll up.")
+            else:
+                self.stdout.write(f"Rolled up {written} row(s) from {first.isoformat()}.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
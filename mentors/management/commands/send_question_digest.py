@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mentors.outbox import queue_admin_digest
+
+
+class Command(BaseCommand):
+    help = "Queue one admin email listing new questions (for QUESTION_DIGEST_MINUTES > 0)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running, one digest per interval")
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help="Seconds between digests (default QUESTION_DIGEST_MINUTES)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.QUESTION_DIGEST_MINUTES * 60 or 15 * 60
+        while True:
+            covered = queue_admin_digest()
+            if covered:
+                self.stdout.write(f"Queued a digest of {covered} question(s).")
+            if not options['loop']:
+                break
+            time.sleep(interval)
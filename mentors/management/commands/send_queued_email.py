@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mentors.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails in batches over one SMTP connection, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new jobs")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(batch_size=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}.")
+            if not options['loop']:
+                break
+            if not (sent or failed):
+                time.sleep(options['interval'])
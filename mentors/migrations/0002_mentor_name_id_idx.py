@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mentor',
+            index=models.Index(fields=['name', 'id'], name='mentor_name_id_idx'),
+        ),
+    ]
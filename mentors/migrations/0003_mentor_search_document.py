@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:07
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE mentors_mentorsearch_fts USING fts5(
+        title, body,
+        content='mentors_mentorsearchdocument', content_rowid='mentor_id',
+        prefix='2 3', tokenize='unicode61'
+    )""",
+    """CREATE TRIGGER mentors_mentorsearch_ai AFTER INSERT ON mentors_mentorsearchdocument BEGIN
+        INSERT INTO mentors_mentorsearch_fts(rowid, title, body) VALUES (new.mentor_id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER mentors_mentorsearch_ad AFTER DELETE ON mentors_mentorsearchdocument BEGIN
+        INSERT INTO mentors_mentorsearch_fts(mentors_mentorsearch_fts, rowid, title, body)
+        VALUES ('delete', old.mentor_id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER mentors_mentorsearch_au AFTER UPDATE ON mentors_mentorsearchdocument BEGIN
+        INSERT INTO mentors_mentorsearch_fts(mentors_mentorsearch_fts, rowid, title, body)
+        VALUES ('delete', old.mentor_id, old.title, old.body);
+        INSERT INTO mentors_mentorsearch_fts(rowid, title, body) VALUES (new.mentor_id, new.title, new.body);
+    END""",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS mentors_mentorsearch_au",
+    "DROP TRIGGER IF EXISTS mentors_mentorsearch_ad",
+    "DROP TRIGGER IF EXISTS mentors_mentorsearch_ai",
+    "DROP TABLE IF EXISTS mentors_mentorsearch_fts",
+]
+POSTGRES_FORWARD = [
+    """CREATE INDEX mentors_mentorsearch_gin ON mentors_mentorsearchdocument USING gin (
+        (setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B'))
+    )""",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS mentors_mentorsearch_gin",
+]
+
+
+# A frozen copy of mentors.search.normalize as it was when this migration
+# was written, so later changes there can't change what this migration does
+_FOLD = str.maketrans({'ı': 'i', 'ə': 'e', 'ø': 'o'})
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', (text or '').casefold().translate(_FOLD))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(_TOKEN_RE.findall(text))
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+    Mentor = apps.get_model('mentors', 'Mentor')
+    MentorSearchDocument = apps.get_model('mentors', 'MentorSearchDocument')
+    MentorSearchDocument.objects.bulk_create(
+        [
+            MentorSearchDocument(
+                mentor_id=mentor.pk,
+                title=normalize(mentor.name),
+                body=normalize(' '.join([mentor.university, mentor.department, mentor.expertise, mentor.bio])),
+            )
+            for mentor in Mentor.objects.filter(is_active=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0002_mentor_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorSearchDocument',
+            fields=[
+                ('mentor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='mentors.mentor')),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
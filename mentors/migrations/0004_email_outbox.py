@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0003_mentor_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='mentor_email_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('sent', 'Delivered'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='user_email_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('sent', 'Delivered'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='EmailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('admin', 'Admin notification'), ('mentor', 'Question to mentor'), ('user', 'Answer to user')], max_length=10)),
+                ('to_email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_jobs', to='mentors.question')),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='emailjob_status_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0004_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailjob',
+            name='batch',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
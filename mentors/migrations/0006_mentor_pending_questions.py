@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_pending(apps, schema_editor):
+    Mentor = apps.get_model('mentors', 'Mentor')
+    Question = apps.get_model('mentors', 'Question')
+    pending = (
+        Question.objects.filter(mentor=OuterRef('pk'), status='pending')
+        .order_by().values('mentor').annotate(n=Count('id')).values('n')
+    )
+    Mentor.objects.update(pending_questions=Coalesce(Subquery(pending), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0005_emailjob_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mentor',
+            name='pending_questions',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_pending, migrations.RunPython.noop),
+    ]
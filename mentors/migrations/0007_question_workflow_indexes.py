@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0006_mentor_pending_questions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', '-created_at'], name='question_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['mentor', 'status'], name='question_mentor_status_idx'),
+        ),
+    ]
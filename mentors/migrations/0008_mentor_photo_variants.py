@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0007_question_workflow_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mentor',
+            name='photo_variants',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
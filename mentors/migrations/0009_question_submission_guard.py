@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:23
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_notified(apps, schema_editor):
+    # Existing questions already got their admin email; keep them out of digests
+    Question = apps.get_model('mentors', 'Question')
+    Question.objects.update(admin_notified_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0008_mentor_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='admin_notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(mark_notified, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['content_hash', 'created_at'], name='question_hash_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('admin_notified_at__isnull', True)), fields=['created_at'], name='question_digest_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0009_question_submission_guard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedQuestion',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_name', models.CharField(max_length=100)),
+                ('user_email', models.EmailField(max_length=254)),
+                ('question_text', models.TextField()),
+                ('answer_text', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Assigned to Mentor'), ('answered', 'Answered by Mentor'), ('approved', 'Approved by Admin'), ('rejected', 'Rejected by Admin'), ('sent', 'Sent to User')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('answered_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('mentor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_questions', to='mentors.mentor')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-created_at'], name='archived_status_created_idx'), models.Index(fields=['mentor', 'status'], name='archived_mentor_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0011_mentor_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerVector',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('source_updated_at', models.DateTimeField()),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnswerTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('vector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='mentors.answervector')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'vector'], name='answerterm_term_vector_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vector', 'term'), name='answerterm_vector_term_uniq')],
+            },
+        ),
+    ]
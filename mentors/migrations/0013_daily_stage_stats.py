@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0012_answer_similarity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStageStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('stage', models.CharField(choices=[('assigned', 'Asked to assigned'), ('answered', 'Assigned to answered'), ('approved', 'Answered to approved'), ('sent', 'Approved to sent'), ('total', 'Asked to sent')], max_length=10)),
+                ('count', models.PositiveIntegerField()),
+                ('p50_seconds', models.FloatField()),
+                ('p90_seconds', models.FloatField()),
+                ('max_seconds', models.FloatField()),
+                ('histogram', models.JSONField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['assigned_at'], name='question_assigned_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['answered_at'], name='question_answered_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['approved_at'], name='question_approved_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['sent_at'], name='question_sent_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailystagestats',
+            name='mentor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='mentors.mentor'),
+        ),
+        migrations.AddIndex(
+            model_name='dailystagestats',
+            index=models.Index(fields=['day'], name='dailystagestats_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystagestats',
+            constraint=models.UniqueConstraint(fields=('day', 'mentor', 'stage'), name='dailystagestats_day_mentor_stage_uniq'),
+        ),
+    ]
@@ -0,0 +1,404 @@
+from django.conf import settings
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+
+def site_url(path):
+    """Absolute URL for links in emails, which are built outside any request"""
+    return settings.SITE_URL.rstrip('/') + path
+
+
+class Mentor(models.Model):
+    name = models.CharField(max_length=100)
+    university = models.CharField(max_length=100)
+    department = models.CharField(max_length=100)
+    initials = models.CharField(max_length=2)
+    gradient = models.CharField(max_length=50, default='from-purple-400 to-pink-400')
+    slug = models.SlugField(unique=True)
+    bio = models.TextField(blank=True)
+    expertise = models.CharField(max_length=200, blank=True)
+    email = models.EmailField(blank=True)
+    is_active = models.BooleanField(default=True)
+    profile_photo = models.ImageField(upload_to='mentors/profile_photos/', blank=True, null=True)
+    # Resized card variants of profile_photo, built by `manage.py process_mentor_photos`;
+    # None while the current photo still has to be processed
+    photo_variants = models.JSONField(null=True, blank=True, editable=False)
+    # Denormalized count of this mentor's pending questions, kept by mentors.counters
+    pending_questions = models.PositiveIntegerField(default=0, editable=False)
+    # Last change to anything the public pages show; see mentors.caching.stored_version
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='mentor_name_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_photo = instance.__dict__.get('profile_photo')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.profile_photo.name != getattr(self, '_loaded_photo', None):
+            self.photo_variants = None
+        super().save(*args, **kwargs)
+        self._loaded_photo = self.profile_photo.name
+
+    @property
+    def photo(self):
+        from .images import photo_sources
+        return photo_sources(self.profile_photo.name, self.photo_variants)
+
+    def pending_questions_count(self):
+        return self.question_set.filter(status='pending').count()
+
+    def inbox_url(self):
+        from .tokens import inbox_token
+        return site_url(reverse('mentor_inbox', args=[inbox_token(self)]))
+
+
+class MentorSearchDocument(models.Model):
+    """Normalized text of an active mentor, mirrored into the full-text index"""
+    mentor = models.OneToOneField(Mentor, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.TextField()
+    body = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.title
+
+
+class MentorPage(models.Model):
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
+EMAIL_STATUS_CHOICES = [
+    ('queued', 'Queued'),
+    ('sent', 'Delivered'),
+    ('failed', 'Failed'),
+]
+
+
+class QuestionQuerySet(models.QuerySet):
+    def transition(self, name, **fields):
+        """
+        Move every row currently in the transition's source status in one
+        conditional UPDATE and return how many rows moved.
+
+        Rows in any other status are left alone, so racing requests can
+        never apply the same transition twice.
+        """
+        return self._transition(name, fields)
+
+    def _transition(self, name, fields):
+        """transition(), completing fields in place with what it writes"""
+        sources, target, stamp = Question.TRANSITIONS[name]
+        fields['status'] = target
+        if stamp:
+            fields[stamp] = timezone.now()
+        rows = self.filter(status__in=sources)
+        mentor_ids = None
+        if 'pending' in sources or fields.get('mentor'):
+            from .counters import refresh_pending
+            mentor_ids = set(rows.values_list('mentor_id', flat=True).distinct())
+            if fields.get('mentor'):
+                mentor_ids.add(fields['mentor'].pk)
+        moved = rows.update(**fields)
+        if moved and mentor_ids:
+            refresh_pending(mentor_ids)
+        return moved
+
+
+class Question(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('assigned', 'Assigned to Mentor'),
+        ('answered', 'Answered by Mentor'),
+        ('approved', 'Approved by Admin'),
+        ('rejected', 'Rejected by Admin'),
+        ('sent', 'Sent to User'),
+    ]
+    # name: (allowed source statuses, target status, timestamp field to set)
+    TRANSITIONS = {
+        'assign': (('pending',), 'assigned', 'assigned_at'),
+        'answer': (('assigned',), 'answered', 'answered_at'),
+        'approve': (('answered',), 'approved', 'approved_at'),
+        'reject': (('answered',), 'rejected', None),
+        'mark_sent': (('approved',), 'sent', 'sent_at'),
+    }
+
+    user_name = models.CharField(max_length=100)
+    user_email = models.EmailField()
+    question_text = models.TextField()
+    mentor = models.ForeignKey(Mentor, on_delete=models.SET_NULL, null=True, blank=True)
+    answer_text = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    assigned_at = models.DateTimeField(null=True, blank=True)
+    answered_at = models.DateTimeField(null=True, blank=True)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    mentor_email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, blank=True)
+    user_email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, blank=True)
+    # Hash of asker, text and mentor; see mentors.guard.content_hash
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # When the admin was told about the question, by its own email or a digest
+    admin_notified_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='question_status_created_idx'),
+            models.Index(fields=['mentor', 'status'], name='question_mentor_status_idx'),
+            models.Index(fields=['content_hash', 'created_at'], name='question_hash_created_idx'),
+            models.Index(
+                fields=['created_at'], name='question_digest_pending_idx',
+                condition=models.Q(admin_notified_at__isnull=True),
+            ),
+            # Range scans of the daily SLA rollup; see mentors.rollup
+            models.Index(fields=['assigned_at'], name='question_assigned_at_idx'),
+            models.Index(fields=['answered_at'], name='question_answered_at_idx'),
+            models.Index(fields=['approved_at'], name='question_approved_at_idx'),
+            models.Index(fields=['sent_at'], name='question_sent_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"Question from {self.user_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so post_save can tell what changed
+        instance._loaded_state = (instance.__dict__.get('mentor_id'), instance.__dict__.get('status'))
+        return instance
+
+    def admin_message(self, admin_url):
+        """(subject, body) of the email telling the admin about a new question"""
+        return (
+            f"New Question from {self.user_name}",
+            f"You have a new question from {self.user_name} ({self.user_email}):\n\n"
+            f"{self.question_text}\n\n"
+            f"Login to the admin panel to assign it to a mentor: {admin_url}",
+        )
+
+    def mentor_message(self):
+        """(subject, body) of the email that hands this question to its mentor"""
+        return (
+            f"New question from {self.user_name}",
+            f"Hello {self.mentor.name},\n\n"
+            f"You have a new question from {self.user_name}:\n\n"
+            f"{self.question_text}\n\n"
+            f"Write your answer here: {self.answer_url()}\n\n"
+            f"All questions waiting for you: {self.mentor.inbox_url()}",
+        )
+
+    def answer_url(self):
+        from .tokens import answer_token
+        return site_url(reverse('mentor_answer', args=[answer_token(self)]))
+
+    def answer_message(self):
+        """(subject, body) of the email that delivers the approved answer"""
+        return (
+            "Your question has been answered",
+            f"Hello {self.user_name},\n\n"
+            f"Your question:\n{self.question_text}\n\n"
+            f"Answer from {self.mentor.name if self.mentor else 'our mentor'}:\n{self.answer_text}\n\n"
+            f"Thank you for using Bloo!",
+        )
+
+    def transition(self, name, **fields):
+        """Apply a transition to this row only; True if it was in a valid source status"""
+        moved = Question.objects.filter(pk=self.pk)._transition(name, fields)
+        if moved:
+            # The row now holds exactly what was written, no need to reload it
+            for field, value in fields.items():
+                setattr(self, field, value)
+            self._loaded_state = (self.mentor_id, self.status)
+        return bool(moved)
+
+    def send_to_mentor(self, request):
+        """Assign the pending question to self.mentor and queue the email; False if it can't be"""
+        if not self.mentor or not self.mentor.email:
+            return False
+        from .outbox import enqueue
+        # Assigned and emailed together, or neither
+        with transaction.atomic():
+            if not self.transition('assign', mentor=self.mentor, mentor_email_status='queued'):
+                return False
+            enqueue(EmailJob.KIND_MENTOR, *self.mentor_message(), self.mentor.email, question=self)
+        return True
+
+    def send_to_user(self):
+        """Queue the approved answer for the user; the outbox worker marks it sent on delivery"""
+        from .outbox import enqueue
+        with transaction.atomic():
+            queued = Question.objects.filter(pk=self.pk, status='approved').exclude(
+                user_email_status='queued',
+            ).update(user_email_status='queued')
+            if not queued:
+                return False
+            enqueue(EmailJob.KIND_USER, *self.answer_message(), self.user_email, question=self)
+        self.user_email_status = 'queued'
+        return True
+
+
+class ArchivedQuestion(models.Model):
+    """A finished question moved out of the Question table; see mentors.archive"""
+    # Same id as the Question it came from
+    id = models.BigIntegerField(primary_key=True)
+    user_name = models.CharField(max_length=100)
+    user_email = models.EmailField()
+    question_text = models.TextField()
+    mentor = models.ForeignKey(
+        Mentor, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_questions',
+    )
+    answer_text = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=Question.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    assigned_at = models.DateTimeField(null=True, blank=True)
+    answered_at = models.DateTimeField(null=True, blank=True)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    # Question fields carried over as they are
+    COPIED_FIELDS = [
+        'id', 'user_name', 'user_email', 'question_text', 'mentor_id', 'answer_text', 'status',
+        'created_at', 'updated_at', 'assigned_at', 'answered_at', 'approved_at', 'sent_at',
+    ]
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='archived_status_created_idx'),
+            models.Index(fields=['mentor', 'status'], name='archived_mentor_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived question from {self.user_name}"
+
+    @classmethod
+    def from_question(cls, question):
+        return cls(**{field: getattr(question, field) for field in cls.COPIED_FIELDS})
+
+
+class AnswerVector(models.Model):
+    """TF-IDF vector of an answered question's text; see mentors.similarity"""
+    # Id of the Question or ArchivedQuestion it was built from; archiving
+    # keeps the id, so the entry stays valid
+    id = models.BigIntegerField(primary_key=True)
+    # updated_at of the question when it was indexed; a newer one means re-index
+    source_updated_at = models.DateTimeField()
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Answer vector of question {self.pk}"
+
+
+class AnswerTerm(models.Model):
+    """One non-zero component of an AnswerVector, i.e. a posting of the term"""
+    vector = models.ForeignKey(AnswerVector, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vector', 'term'], name='answerterm_vector_term_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'vector'], name='answerterm_term_vector_idx'),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class DailyStageStats(models.Model):
+    """Questions one mentor moved through one stage on one day; see mentors.rollup"""
+    STAGE_CHOICES = [
+        ('assigned', 'Asked to assigned'),
+        ('answered', 'Assigned to answered'),
+        ('approved', 'Answered to approved'),
+        ('sent', 'Approved to sent'),
+        ('total', 'Asked to sent'),
+    ]
+
+    # Local date the stage was reached
+    day = models.DateField()
+    mentor = models.ForeignKey(Mentor, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_stats')
+    stage = models.CharField(max_length=10, choices=STAGE_CHOICES)
+    count = models.PositiveIntegerField()
+    # Latency of the stage in seconds
+    p50_seconds = models.FloatField()
+    p90_seconds = models.FloatField()
+    max_seconds = models.FloatField()
+    # Counts per mentors.rollup.BUCKETS latency bucket; these add up across
+    # rows, so percentiles over any period come from them
+    histogram = models.JSONField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'mentor', 'stage'], name='dailystagestats_day_mentor_stage_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='dailystagestats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_stage_display()} on {self.day}"
+
+
+class EmailJob(models.Model):
+    """Outbound email written in the same transaction as the change that caused it"""
+    KIND_ADMIN = 'admin'
+    KIND_MENTOR = 'mentor'
+    KIND_USER = 'user'
+    KIND_CHOICES = [
+        (KIND_ADMIN, 'Admin notification'),
+        (KIND_MENTOR, 'Question to mentor'),
+        (KIND_USER, 'Answer to user'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True, related_name='email_jobs')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    batch = models.CharField(max_length=32, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='emailjob_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email}"
@@ -0,0 +1,222 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .models import EmailJob, Question, site_url
+
+# Question field that mirrors delivery of each kind of job
+STATUS_FIELDS = {
+    EmailJob.KIND_MENTOR: 'mentor_email_status',
+    EmailJob.KIND_USER: 'user_email_status',
+}
+
+
+def enqueue(kind, subject, body, to_email, question=None):
+    """Write an email job; call inside the transaction that saves the question"""
+    return EmailJob.objects.create(
+        kind=kind,
+        subject=subject,
+        body=body,
+        to_email=to_email,
+        question=question,
+    )
+
+
+def new_batch():
+    return uuid.uuid4().hex
+
+
+def enqueue_many(jobs, batch_size=500):
+    """bulk_create unsaved EmailJob instances; returns how many were written"""
+    created = 0
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) >= batch_size:
+            created += len(EmailJob.objects.bulk_create(chunk))
+            chunk = []
+    created += len(EmailJob.objects.bulk_create(chunk))
+    return created
+
+
+def batch_progress(batch):
+    """Job counts per status for one admin action, in a single query"""
+    counts = dict.fromkeys(dict(EmailJob.STATUS_CHOICES), 0)
+    rows = EmailJob.objects.filter(batch=batch).values_list('status').annotate(n=Count('id')).order_by()
+    counts.update(rows)
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def queue_admin_digest(limit=200):
+    """
+    Queue one admin email listing questions nobody has been told about yet.
+
+    Returns how many questions it covered. Questions past `limit` wait for
+    the next digest.
+    """
+    admin_url = site_url(reverse('admin:mentors_question_changelist'))
+    with transaction.atomic():
+        questions = list(
+            Question.objects.filter(admin_notified_at__isnull=True)
+            .select_related('mentor').order_by('created_at')[:limit]
+        )
+        if not questions:
+            return 0
+        claimed = Question.objects.filter(
+            pk__in=[q.pk for q in questions], admin_notified_at__isnull=True,
+        ).update(admin_notified_at=timezone.now())
+        if claimed != len(questions):
+            # Another digest run got some of them first; try again next round
+            transaction.set_rollback(True)
+            return 0
+        lines = []
+        for question in questions:
+            to = f" for {question.mentor.name}" if question.mentor else ""
+            lines.append(
+                f"- {question.user_name} ({question.user_email}){to}, "
+                f"{timezone.localtime(question.created_at):%Y-%m-%d %H:%M}\n"
+                f"  {Truncator(' '.join(question.question_text.split())).chars(200)}"
+            )
+        enqueue(
+            EmailJob.KIND_ADMIN,
+            f"{len(questions)} new question{'s' if len(questions) != 1 else ''} on Bloo",
+            "\n\n".join(lines) + f"\n\nAssign them to mentors in the admin panel: {admin_url}",
+            settings.ADMIN_EMAIL,
+        )
+    return len(questions)
+
+
+def backoff(attempts):
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 6 * 60 * 60))
+
+
+def stale_after():
+    """
+    How long a claimed job may go without news before it counts as abandoned.
+
+    The worker renews the claim just before sending each job, so this only
+    has to outlast one job: a reconnect plus a send, each up to EMAIL_TIMEOUT.
+    """
+    timeout = getattr(settings, 'EMAIL_TIMEOUT', None) or 30
+    return max(timedelta(minutes=10), timedelta(seconds=4 * timeout))
+
+
+def release_stale(older_than=None):
+    """Requeue jobs a crashed worker claimed but never finished"""
+    return EmailJob.objects.filter(
+        status='sending', locked_at__lt=timezone.now() - (older_than or stale_after()),
+    ).update(status='queued', locked_at=None)
+
+
+def claim_batch(batch_size):
+    """
+    Claim due jobs so two workers never send the same one.
+
+    One UPDATE moves the candidates to 'sending' with this claim's stamp
+    and only rows carrying that stamp are read back, so the cost doesn't
+    grow with the batch. Where the database can, candidates another worker
+    is claiming right now are skipped instead of waited for.
+    """
+    now = timezone.now()
+    due = EmailJob.objects.filter(status='queued', next_attempt_at__lte=now)
+    with transaction.atomic():
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        pks = list(due.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return []
+        EmailJob.objects.filter(pk__in=pks, status='queued').update(status='sending', locked_at=now)
+    return list(
+        EmailJob.objects.filter(pk__in=pks, status='sending', locked_at=now).select_related('question')
+    )
+
+
+def _claimed(job):
+    """This worker's claim on job, as an update filter"""
+    return EmailJob.objects.filter(pk=job.pk, status='sending', locked_at=job.locked_at)
+
+
+def _renew(job):
+    """Restamp the claim before sending; False if it was released or taken over meanwhile"""
+    now = timezone.now()
+    if not _claimed(job).update(locked_at=now):
+        return False
+    job.locked_at = now
+    return True
+
+
+def _mark_sent(job):
+    now = timezone.now()
+    if not _claimed(job).update(status='sent', sent_at=now, attempts=job.attempts + 1, locked_at=None):
+        return
+    if job.question_id and job.kind in STATUS_FIELDS:
+        questions = Question.objects.filter(pk=job.question_id)
+        if job.kind == EmailJob.KIND_USER and questions.transition('mark_sent', user_email_status='sent'):
+            return
+        questions.update(**{STATUS_FIELDS[job.kind]: 'sent'})
+
+
+def _mark_failed(job, error):
+    attempts = job.attempts + 1
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    if attempts < max_attempts:
+        _claimed(job).update(
+            status='queued', attempts=attempts, last_error=error, locked_at=None,
+            next_attempt_at=timezone.now() + backoff(attempts),
+        )
+        return
+    if not _claimed(job).update(status='failed', attempts=attempts, last_error=error, locked_at=None):
+        return
+    if job.question_id and job.kind in STATUS_FIELDS:
+        Question.objects.filter(pk=job.question_id).update(**{STATUS_FIELDS[job.kind]: 'failed'})
+
+
+def deliver(jobs, connection=None):
+    """
+    Send claimed jobs over one SMTP session.
+
+    If the connection breaks mid-batch it is reopened for the remaining
+    jobs. Returns (sent, failed).
+    """
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        for job in jobs:
+            if not _renew(job):
+                # Released as stale and picked up by another worker
+                continue
+            message = EmailMessage(
+                job.subject, job.body, settings.DEFAULT_FROM_EMAIL, [job.to_email], connection=connection,
+            )
+            try:
+                connection.open()  # no-op while the session is still up
+                message.send()
+            except Exception as exc:
+                _mark_failed(job, f"{type(exc).__name__}: {exc}")
+                failed += 1
+                connection.close()
+            else:
+                _mark_sent(job)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def drain(batch_size=None, connection=None):
+    """Send one batch of due jobs; returns (sent, failed)"""
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    release_stale()
+    jobs = claim_batch(batch_size)
+    if not jobs:
+        return 0, 0
+    return deliver(jobs, connection=connection)
@@ -0,0 +1,71 @@
+import base64
+import json
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 6
+MAX_PAGE_SIZE = 48
+
+
+def encode_cursor(*key):
+    """Opaque cursor pointing just past the sort key of the last row sent"""
+    raw = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """Return the sort key in a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(key, list) or len(key) != len(types):
+        return None
+    if not all(isinstance(value, kind) for value, kind in zip(key, types)):
+        return None
+    return tuple(key)
+
+
+def parse_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _keyset_slice(queryset, cursor, page_size):
+    position = decode_cursor(cursor, str, int)
+    queryset = queryset.order_by('name', 'id')
+    if position:
+        name, pk = position
+        queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+    return queryset[:page_size + 1]
+
+
+def _cut_page(rows, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['name'], last['id'])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Slice one page off a queryset ordered by (name, id) without OFFSET.
+
+    Fetches page_size + 1 rows so we know whether another page exists
+    without a COUNT. Returns (rows, next_cursor).
+    """
+    return _cut_page(list(_keyset_slice(queryset, cursor, page_size)), page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """keyset_page for async views"""
+    rows = [row async for row in _keyset_slice(queryset, cursor, page_size)]
+    return _cut_page(rows, page_size)
@@ -0,0 +1,221 @@
+"""
+Daily SLA rollup of the question workflow.
+
+For every local day, mentor and stage, DailyStageStats holds how many
+questions reached the stage and how long the stage took them: exact
+p50/p90/max for the day, plus a histogram over fixed latency BUCKETS.
+Histograms add up, so the dashboard gets percentiles for any period by
+summing a few hundred rollup rows. It never reads Question.
+
+`manage.py rollup_stats` recomputes whole days, a chunk of days per
+transaction. A regular pass redoes the last couple of days, which catches
+questions whose stage was reached while the previous pass ran. The first
+pass, or one with --since, backfills from the archive too. Archiving only
+moves questions that reached their last stage ARCHIVE_AFTER_DAYS ago, so
+their days were rolled up long before; a pass catching up that far reads
+the archive as well.
+"""
+import bisect
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .archive import cutoff
+from .models import ArchivedQuestion, DailyStageStats, Mentor, Question
+
+# stage: (timestamp of reaching it, timestamp its latency is measured from)
+STAGES = {
+    'assigned': ('assigned_at', 'created_at'),
+    'answered': ('answered_at', 'assigned_at'),
+    'approved': ('approved_at', 'answered_at'),
+    'sent': ('sent_at', 'approved_at'),
+    'total': ('sent_at', 'created_at'),
+}
+# Upper bounds in seconds of the histogram buckets: 1m to 30d, and a last
+# bucket for anything slower
+BUCKETS = [
+    60, 300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 5 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+]
+# Days recomputed per transaction
+CHUNK_DAYS = 31
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def histogram(values):
+    counts = [0] * (len(BUCKETS) + 1)
+    for value in values:
+        counts[bisect.bisect_left(BUCKETS, value)] += 1
+    return counts
+
+
+def histogram_percentile(counts, q, slowest):
+    """Upper bound of the bucket holding the q-th percentile; slowest for the last bucket"""
+    rank = max(1, math.ceil(q * sum(counts)))
+    seen = 0
+    for i, n in enumerate(counts):
+        seen += n
+        if seen >= rank:
+            return min(BUCKETS[i], slowest) if i < len(BUCKETS) else slowest
+    return slowest
+
+
+def latencies(first_day, last_day, include_archive=False):
+    """{(day, mentor_id, stage): [seconds, ...]} for stages reached in first_day..last_day"""
+    start, end = _midnight(first_day), _midnight(last_day + timedelta(days=1))
+    samples = defaultdict(list)
+    for model in (Question, ArchivedQuestion) if include_archive else (Question,):
+        for stage, (reached, since) in STAGES.items():
+            rows = model.objects.filter(**{
+                f'{reached}__gte': start, f'{reached}__lt': end, f'{since}__isnull': False,
+            }).values_list('mentor_id', reached, since).order_by()
+            for mentor_id, reached_at, since_at in rows.iterator(chunk_size=5000):
+                day = timezone.localdate(reached_at)
+                samples[(day, mentor_id, stage)].append(max(0.0, (reached_at - since_at).total_seconds()))
+    return samples
+
+
+def rollup_days(first_day, last_day, include_archive=False):
+    """Recompute the rows of first_day..last_day; returns how many rows were written"""
+    written = 0
+    chunk_start = first_day
+    while chunk_start <= last_day:
+        chunk_end = min(last_day, chunk_start + timedelta(days=CHUNK_DAYS - 1))
+        rows = []
+        for (day, mentor_id, stage), values in latencies(chunk_start, chunk_end, include_archive).items():
+            values.sort()
+            rows.append(DailyStageStats(
+                day=day, mentor_id=mentor_id, stage=stage, count=len(values),
+                p50_seconds=percentile(values, 0.5), p90_seconds=percentile(values, 0.9),
+                max_seconds=values[-1], histogram=histogram(values),
+            ))
+        with transaction.atomic():
+            DailyStageStats.objects.filter(day__gte=chunk_start, day__lte=chunk_end).delete()
+            DailyStageStats.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def first_day():
+    """Local date of the oldest question, live or archived, or None"""
+    oldest = [
+        model.objects.aggregate(oldest=Min('created_at'))['oldest']
+        for model in (Question, ArchivedQuestion)
+    ]
+    oldest = [moment for moment in oldest if moment is not None]
+    return timezone.localdate(min(oldest)) if oldest else None
+
+
+def update_rollup(days=2, since=None):
+    """
+    Bring the rollup up to date; returns (first day recomputed, rows written).
+
+    Recomputes the last `days` days, reaching back to the newest rolled-up
+    day if passes were missed. With since, or on an empty rollup, it
+    backfills from that day or the oldest question, archive included.
+    """
+    today = timezone.localdate()
+    newest = DailyStageStats.objects.aggregate(newest=Max('day'))['newest']
+    backfill = since is not None or newest is None
+    if since is None:
+        since = first_day() if newest is None else min(newest, today - timedelta(days=max(days, 1) - 1))
+    if since is None:
+        return None, 0
+    # Catching up on missed passes can reach days archiving has touched
+    archived = since <= timezone.localdate(cutoff())
+    return since, rollup_days(since, today, include_archive=backfill or archived)
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+class _Totals:
+    def __init__(self):
+        self.count = 0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.slowest = 0.0
+
+    def add(self, row):
+        self.count += row['count']
+        self.histogram = [a + b for a, b in zip(self.histogram, row['histogram'])]
+        self.slowest = max(self.slowest, row['max_seconds'])
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0, 'p50': '-', 'p90': '-', 'max': '-', 'p90_seconds': 0}
+        p90 = histogram_percentile(self.histogram, 0.9, self.slowest)
+        return {
+            'count': self.count,
+            'p50': format_seconds(histogram_percentile(self.histogram, 0.5, self.slowest)),
+            'p90': format_seconds(p90),
+            'max': format_seconds(self.slowest),
+            'p90_seconds': p90,
+        }
+
+
+def dashboard(days=30):
+    """
+    Stage, mentor and daily throughput tables for the last `days` days.
+
+    Two queries over at most days x mentors x stages rollup rows, however
+    many questions there are.
+    """
+    first = timezone.localdate() - timedelta(days=days - 1)
+    rows = list(
+        DailyStageStats.objects.filter(day__gte=first)
+        .values('day', 'mentor_id', 'stage', 'count', 'max_seconds', 'histogram', 'computed_at')
+    )
+    stages = defaultdict(_Totals)
+    mentors = defaultdict(lambda: defaultdict(_Totals))
+    daily = defaultdict(lambda: dict.fromkeys(STAGES, 0))
+    for row in rows:
+        stages[row['stage']].add(row)
+        mentors[row['mentor_id']][row['stage']].add(row)
+        daily[row['day']][row['stage']] += row['count']
+    names = dict(Mentor.objects.filter(pk__in=[pk for pk in mentors if pk]).values_list('pk', 'name'))
+    mentor_rows = [
+        {
+            'name': names.get(pk, 'No mentor'),
+            'answered': totals['answered'].summary(),
+            'total': totals['total'].summary(),
+        }
+        for pk, totals in mentors.items()
+    ]
+    # Slowest answerers first: those are the bottlenecks
+    mentor_rows.sort(key=lambda row: (-row['answered']['p90_seconds'], row['name']))
+    stage_rows = [
+        {'stage': label, **stages[stage].summary()} for stage, label in DailyStageStats.STAGE_CHOICES
+    ]
+    # The slowest step; 'total' spans all of them
+    steps = [row for row in stage_rows[:-1] if row['count']]
+    if steps:
+        max(steps, key=lambda row: row['p90_seconds'])['bottleneck'] = True
+    return {
+        'first_day': first,
+        'computed_at': max((row['computed_at'] for row in rows), default=None),
+        'stages': stage_rows,
+        'mentors': mentor_rows,
+        'daily': [{'day': day, **counts} for day, counts in sorted(daily.items(), reverse=True)],
+    }
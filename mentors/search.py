@@ -0,0 +1,152 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Mentor, MentorSearchDocument
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+
+FTS_TABLE = 'mentors_mentorsearch_fts'
+DOCUMENT_TABLE = MentorSearchDocument._meta.db_table
+
+# Name hits outrank university/department/expertise/bio hits
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+MAX_QUERY_TERMS = 8
+
+# Letters NFKD does not decompose into a base letter plus a mark
+_FOLD = str.maketrans({'ı': 'i', 'ə': 'e', 'ø': 'o'})
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """
+    Fold text the way both the index and the queries see it.
+
+    Azerbaijani casing is handled by folding dotted and dotless i together
+    (İ/I/ı/i all become "i"), and accents are stripped so "Şahin" and
+    "Sahin" or "Əliyev" and "Eliyev" match each other.
+    """
+    text = unicodedata.normalize('NFKD', (text or '').casefold().translate(_FOLD))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(_TOKEN_RE.findall(text))
+
+
+def query_terms(query):
+    return normalize(query).split()[:MAX_QUERY_TERMS]
+
+
+def build_document(mentor):
+    return {
+        'title': normalize(mentor.name),
+        'body': normalize(' '.join([
+            mentor.university, mentor.department, mentor.expertise, mentor.bio,
+        ])),
+    }
+
+
+def update_document(mentor):
+    """Index an active mentor, or drop an inactive one from the index"""
+    if not mentor.is_active:
+        delete_document(mentor.pk)
+        return
+    MentorSearchDocument.objects.update_or_create(mentor_id=mentor.pk, defaults=build_document(mentor))
+
+
+def delete_document(mentor_id):
+    MentorSearchDocument.objects.filter(mentor_id=mentor_id).delete()
+
+
+def rebuild_index(batch_size=1000):
+    """Recreate every document, for use after bulk edits that skip signals"""
+    MentorSearchDocument.objects.all().delete()
+    batch = []
+    mentors = Mentor.objects.filter(is_active=True).only(
+        'id', 'name', 'university', 'department', 'expertise', 'bio',
+    )
+    for mentor in mentors.iterator(chunk_size=batch_size):
+        batch.append(MentorSearchDocument(mentor_id=mentor.pk, **build_document(mentor)))
+        if len(batch) >= batch_size:
+            MentorSearchDocument.objects.bulk_create(batch)
+            batch = []
+    MentorSearchDocument.objects.bulk_create(batch)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def _sqlite_search(terms, position, limit):
+    # Every term is a prefix match so partially typed words already hit
+    match = ' AND '.join(f'"{term}"*' for term in terms)
+    score = f'bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})'
+    sql = f'SELECT rowid, {score} AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    params = [match]
+    if position:
+        sql += f' AND ({score} > %s OR ({score} = %s AND rowid > %s))'
+        params += [position[0], position[0], position[1]]
+    sql += ' ORDER BY score, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _postgres_search(terms, position, limit):
+    # The expression must match the GIN index in migration 0003 exactly
+    vector = (
+        "(setweight(to_tsvector('simple', title), 'A') || "
+        "setweight(to_tsvector('simple', body), 'B'))"
+    )
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    sql = (
+        f'SELECT mentor_id, score FROM ('
+        f'SELECT mentor_id, (-ts_rank({vector}, q))::float8 AS score '
+        f"FROM {DOCUMENT_TABLE}, to_tsquery('simple', %s) q WHERE {vector} @@ q"
+        f') ranked'
+    )
+    params = [tsquery]
+    if position:
+        sql += ' WHERE score > %s OR (score = %s AND mentor_id > %s)'
+        params += [position[0], position[0], position[1]]
+    sql += ' ORDER BY score, mentor_id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fallback_search(terms, position, limit):
+    documents = MentorSearchDocument.objects.all()
+    for term in terms:
+        documents = documents.filter(Q(title__contains=term) | Q(body__contains=term))
+    if position:
+        documents = documents.filter(mentor_id__gt=position[1])
+    ids = documents.order_by('mentor_id').values_list('mentor_id', flat=True)[:limit]
+    return [(pk, 0.0) for pk in ids]
+
+
+def search_mentor_ids(query, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of active mentor ids matching query, best match first.
+
+    Pages are keyed on (score, id) the same way mentor_list keys on
+    (name, id), so rows never repeat or go missing between pages.
+    Returns (ids, next_cursor).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], None
+    position = decode_cursor(cursor, float, int)
+    search = {
+        'sqlite': _sqlite_search,
+        'postgresql': _postgres_search,
+    }.get(connection.vendor, _fallback_search)
+    hits = search(terms, position, page_size + 1)
+
+    next_cursor = None
+    if len(hits) > page_size:
+        hits = hits[:page_size]
+        next_cursor = encode_cursor(float(hits[-1][1]), hits[-1][0])
+    return [pk for pk, _ in hits], next_cursor
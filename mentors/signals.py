@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .caching import bump_version
+from .counters import adjust_pending
+from .models import Mentor, MentorPage, Question
+
+
+@receiver(post_save, sender=Mentor)
+def index_mentor(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.update_document(instance)
+
+
+@receiver(post_delete, sender=Mentor)
+def unindex_mentor(sender, instance, **kwargs):
+    search.delete_document(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+def count_pending_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = (instance.mentor_id, instance.status)
+    old = (None, None) if created else getattr(instance, '_loaded_state', new)
+    adjust_pending(old, new)
+    instance._loaded_state = new
+
+
+@receiver(post_delete, sender=Question)
+def count_pending_on_delete(sender, instance, **kwargs):
+    adjust_pending((instance.mentor_id, instance.status), (None, None))
+
+
+@receiver(post_save, sender=Mentor)
+@receiver(post_delete, sender=Mentor)
+@receiver(post_save, sender=MentorPage)
+@receiver(post_delete, sender=MentorPage)
+def invalidate_public_pages(sender, **kwargs):
+    bump_version()
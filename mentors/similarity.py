@@ -0,0 +1,191 @@
+"""
+Finding previously answered questions like a new one.
+
+Every approved or sent question, live or archived, gets a TF-IDF vector of
+its question_text: sublinear term frequency times smoothed idf, scaled to
+unit length. The non-zero components are stored as AnswerTerm postings,
+so a lookup reads only the postings of the query's own terms. It scores
+each candidate by dot product, which for unit vectors is the cosine
+similarity.
+
+`manage.py index_answers` keeps the index current. A pass drops entries
+whose question no longer qualifies, then indexes questions that are new or
+were saved since they were indexed (updated_at). A vector keeps the idf of
+the pass that built it; `--rebuild` recomputes every vector against the
+document frequencies of the whole corpus once it has shifted.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import NamedTuple, Union
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from .assignment import MIN_TERM_LENGTH
+from .models import AnswerTerm, AnswerVector, ArchivedQuestion, Question
+from .search import normalize
+
+# Answers an admin has signed off on
+REUSABLE_STATUSES = ('approved', 'sent')
+# Cosine below which a match is noise rather than a near-duplicate
+MIN_SCORE = 0.2
+# Query terms in more than this share of indexed questions hardly tell them
+# apart and have the longest postings; they are left out of lookups
+MAX_TERM_SHARE = 0.5
+MAX_TERM_LENGTH = AnswerTerm._meta.get_field('term').max_length
+
+
+class SimilarAnswer(NamedTuple):
+    question: Union[Question, ArchivedQuestion]
+    score: float
+
+
+def term_counts(text):
+    return Counter(
+        term[:MAX_TERM_LENGTH] for term in normalize(text).split() if len(term) >= MIN_TERM_LENGTH
+    )
+
+
+def idf(df, total):
+    return math.log((1 + total) / (1 + df)) + 1
+
+
+def tfidf(counts, df, total):
+    """Unit-length TF-IDF weights of a question's term counts"""
+    weights = {term: (1 + math.log(n)) * idf(df.get(term, 0), total) for term, n in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+
+def document_frequencies(terms):
+    """{term: indexed questions containing it}, in one grouped query"""
+    return dict(
+        AnswerTerm.objects.filter(term__in=list(terms))
+        .values_list('term').annotate(n=Count('id')).order_by()
+    )
+
+
+def sources():
+    """The questions that belong in the index: live ones, then archived ones"""
+    return [
+        model.objects.filter(status__in=REUSABLE_STATUSES).exclude(answer_text='')
+        for model in (Question, ArchivedQuestion)
+    ]
+
+
+def _index_batch(questions, df=None, total=None):
+    """
+    (Re)build the vectors of a batch of questions in one transaction.
+
+    Without df/total the idf comes from the index as it stands plus the
+    batch itself.
+    """
+    counts = {question.pk: term_counts(question.question_text) for question in questions}
+    with transaction.atomic():
+        AnswerTerm.objects.filter(vector__in=list(counts)).delete()
+        AnswerVector.objects.filter(pk__in=list(counts)).delete()
+        if df is None:
+            batch_df = Counter(term for terms in counts.values() for term in terms)
+            df = document_frequencies(batch_df)
+            for term, n in batch_df.items():
+                df[term] = df.get(term, 0) + n
+            total = AnswerVector.objects.count() + len(questions)
+        # Questions without a usable term still get an (empty) vector, so
+        # they aren't picked up again by every pass
+        AnswerVector.objects.bulk_create([
+            AnswerVector(pk=question.pk, source_updated_at=question.updated_at) for question in questions
+        ])
+        AnswerTerm.objects.bulk_create(
+            [
+                AnswerTerm(vector_id=pk, term=term, weight=weight)
+                for pk, terms in counts.items()
+                for term, weight in tfidf(terms, df, total).items()
+            ],
+            batch_size=1000,
+        )
+    return len(questions)
+
+
+def _index(queryset, batch_size, df=None, total=None):
+    queryset = queryset.only('id', 'question_text', 'updated_at').order_by('pk')
+    indexed = 0
+    after_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=after_pk)[:batch_size])
+        if not batch:
+            return indexed
+        indexed += _index_batch(batch, df, total)
+        after_pk = batch[-1].pk
+
+
+def prune():
+    """Drop vectors of questions that were deleted, rejected or had their answer removed"""
+    qualifying = [
+        Exists(queryset.filter(pk=OuterRef('pk'))) for queryset in sources()
+    ]
+    stale = AnswerVector.objects.exclude(qualifying[0]).exclude(qualifying[1])
+    AnswerTerm.objects.filter(vector__in=stale).delete()
+    return stale.delete()[0]
+
+
+def update_index(batch_size=500):
+    """Index what is new or changed since the last pass; returns (indexed, dropped)"""
+    dropped = prune()
+    indexed = 0
+    for queryset in sources():
+        current = AnswerVector.objects.filter(pk=OuterRef('pk'), source_updated_at=OuterRef('updated_at'))
+        indexed += _index(queryset.exclude(Exists(current)), batch_size)
+    return indexed, dropped
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every question against the document frequencies of all of them"""
+    df = Counter()
+    total = 0
+    for queryset in sources():
+        for text in queryset.values_list('question_text', flat=True).iterator(chunk_size=2000):
+            df.update(term_counts(text).keys())
+            total += 1
+    dropped = prune()
+    indexed = sum(_index(queryset, batch_size, df, total) for queryset in sources())
+    return indexed, dropped
+
+
+def similar_answers(text, k=None, exclude=None):
+    """
+    Up to k indexed questions most like text, best first.
+
+    Reads the index size, the document frequencies and postings of the
+    query terms, then the matching questions: five queries at most,
+    however large the index.
+    """
+    if k is None:
+        k = settings.SIMILAR_ANSWERS_COUNT
+    counts = term_counts(text)
+    if not counts or k <= 0:
+        return []
+    total = AnswerVector.objects.count()
+    if not total:
+        return []
+    df = document_frequencies(counts)
+    query = tfidf(counts, df, total)
+    common = max(1, total * MAX_TERM_SHARE)
+    terms = [term for term in query if 0 < df.get(term, 0) <= common]
+    if not terms:
+        return []
+    scores = defaultdict(float)
+    for pk, term, weight in AnswerTerm.objects.filter(term__in=terms).values_list('vector_id', 'term', 'weight'):
+        scores[pk] += weight * query[term]
+    scores.pop(exclude, None)
+    best = heapq.nlargest(k, ((score, pk) for pk, score in scores.items() if score >= MIN_SCORE))
+
+    fields = ('id', 'question_text', 'answer_text', 'status', 'created_at', 'mentor__name')
+    found = {}
+    for model in (Question, ArchivedQuestion):
+        missing = [pk for _, pk in best if pk not in found]
+        if missing:
+            found.update(model.objects.select_related('mentor').only(*fields).in_bulk(missing))
+    # An entry whose question is gone since the last pass is skipped
+    return [SimilarAnswer(found[pk], score) for score, pk in best if pk in found]
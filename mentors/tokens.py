@@ -0,0 +1,45 @@
+"""
+Signed, expiring links that let a mentor answer without an account.
+
+An answer token names one question and the mentor it was assigned to,
+so it stops working when the question is reassigned or answered. An
+inbox token names a mentor. Both expire after MENTOR_TOKEN_MAX_AGE.
+"""
+from django.conf import settings
+from django.core import signing
+
+ANSWER_SALT = 'mentors.answer'
+INBOX_SALT = 'mentors.inbox'
+
+
+def _max_age():
+    return getattr(settings, 'MENTOR_TOKEN_MAX_AGE', 14 * 24 * 60 * 60)
+
+
+def _load(token, salt):
+    try:
+        return signing.loads(token, salt=salt, max_age=_max_age())
+    except signing.BadSignature:  # also raised for expired tokens
+        return None
+
+
+def answer_token(question):
+    return signing.dumps([question.pk, question.mentor_id], salt=ANSWER_SALT)
+
+
+def read_answer_token(token):
+    """(question id, mentor id) from a valid answer token, or None"""
+    data = _load(token, ANSWER_SALT)
+    if not isinstance(data, list) or len(data) != 2 or not all(isinstance(pk, int) for pk in data):
+        return None
+    return tuple(data)
+
+
+def inbox_token(mentor):
+    return signing.dumps(mentor.pk, salt=INBOX_SALT)
+
+
+def read_inbox_token(token):
+    """Mentor id from a valid inbox token, or None"""
+    data = _load(token, INBOX_SALT)
+    return data if isinstance(data, int) else None
@@ -6,4 +6,6 @@ urlpatterns = [
     path('ask-question/', views.ask_question, name='ask_question'),
     path('ask-question/<slug:mentor_slug>/', views.ask_question, name='ask_mentor_question'),
     path('question-submitted/', views.question_submitted, name='question_submitted'),
+    path('answer/<str:token>/', views.mentor_answer, name='mentor_answer'),
+    path('inbox/<str:token>/', views.mentor_inbox, name='mentor_inbox'),
 ]
\ No newline at end of file
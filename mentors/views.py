@@ -1,85 +1,163 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, aget_object_or_404
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
 from django.urls import reverse
-from .models import Mentor, MentorPage, Question
-from .forms import QuestionForm
-from django.http import JsonResponse
+from django.db import transaction
+from django.utils import timezone
+from core.http_cache import cache_profile
+from core.ratelimit import client_key
+from .models import EmailJob, Mentor, MentorPage, Question
+from . import caching, guard
+from .forms import AnswerForm, QuestionForm
+from .images import photo_sources
+from .outbox import enqueue
+from .pagination import akeyset_page, parse_page_size
+from .search import search_mentor_ids
+from .tokens import answer_token, read_answer_token, read_inbox_token
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
 from django.core import serializers
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
 
-def mentor_list(request):
+MENTOR_CARD_FIELDS = ('id', 'name', 'university', 'department', 'initials', 'gradient', 'slug', 'profile_photo', 'photo_variants')
+
+# The AJAX branch answers JSON on the same URL, so caches must key on the header
+@cache_profile(
+    'mentor-pages', etag=caching.aetag, last_modified=caching.alast_modified, vary=('X-Requested-With',),
+)
+async def mentor_list(request):
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        query = request.GET.get('q', '').strip()
+        cursor = request.GET.get('cursor')
+        page_size = parse_page_size(request.GET.get('page_size'))
+
+        async def render_page():
+            return JsonResponse(await mentor_page_data(query, cursor, page_size)).content
+
+        content = await caching.aget_or_render('list-json', (query, cursor, page_size), render_page)
+        return HttpResponse(content, content_type='application/json')
+
+    async def render_list():
+        page_data = await MentorPage.objects.afirst()
+        return render_to_string('mentors/mentor_list.html', {'page_data': page_data})
+
+    content = await caching.aget_or_render('list-html', (), render_list)
+    return HttpResponse(content)
+
+async def mentor_page_data(query, cursor, page_size):
+    """One page of mentor cards for the AJAX branch of mentor_list"""
     mentors = Mentor.objects.filter(is_active=True)
-    page_data = MentorPage.objects.first()
-    
-    query = request.GET.get('q')
     if query:
-        mentors = mentors.filter(
-            Q(name__icontains=query) |
-            Q(university__icontains=query) |
-            Q(department__icontains=query)
+        # Raw FTS SQL goes through a sync cursor
+        ids, next_cursor = await sync_to_async(search_mentor_ids)(query, cursor=cursor, page_size=page_size)
+        found = {row['id']: row async for row in mentors.filter(id__in=ids).values(*MENTOR_CARD_FIELDS)}
+        rows = [found[pk] for pk in ids if pk in found]
+    else:
+        rows, next_cursor = await akeyset_page(
+            mentors.values(*MENTOR_CARD_FIELDS), cursor=cursor, page_size=page_size,
         )
-    
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        mentors_data = []
-        for mentor in mentors:
-            mentors_data.append({
-                'id': mentor.id,
-                'name': mentor.name,
-                'university': mentor.university,
-                'department': mentor.department,
-                'initials': mentor.initials,
-                'gradient': mentor.gradient,
-                'slug': mentor.slug,
-                'profile_photo_url': mentor.profile_photo.url if mentor.profile_photo else None,
-            })
-        return JsonResponse({'mentors': mentors_data})
-    
-    context = {
-        'mentors': mentors,
-        'page_data': page_data,
-    }
-    return render(request, 'mentors/mentor_list.html', context)
+    mentors_data = []
+    for row in rows:
+        photo = photo_sources(row.pop('profile_photo'), row.pop('photo_variants'))
+        row['photo'] = photo
+        row['profile_photo_url'] = photo['src'] if photo else None
+        mentors_data.append(row)
+    return {'mentors': mentors_data, 'next_cursor': next_cursor}
+
+@sync_to_async
+def save_question(form, mentor, content_hash, admin_url):
+    """Save a screened question and, unless digests are on, queue its admin email atomically"""
+    with transaction.atomic():
+        question = form.save(commit=False)
+        question.mentor = mentor
+        question.content_hash = content_hash
+        if not settings.QUESTION_DIGEST_MINUTES:
+            question.admin_notified_at = timezone.now()
+        question.save()
+        if question.admin_notified_at:
+            enqueue(EmailJob.KIND_ADMIN, *question.admin_message(admin_url), settings.ADMIN_EMAIL, question=question)
+    return question
 
-def ask_question(request, mentor_slug=None):
+async def ask_question(request, mentor_slug=None):
     mentor = None
     if mentor_slug:
-        mentor = get_object_or_404(Mentor, slug=mentor_slug, is_active=True)
+        mentor = await aget_object_or_404(Mentor, slug=mentor_slug, is_active=True)
     
+    status = 200
     if request.method == 'POST':
         form = QuestionForm(request.POST)
         if form.is_valid():
-            question = form.save(commit=False)
-            if mentor:
-                question.mentor = mentor
-            question.save()
-            
-            try:
-                send_mail(
-                    f"New Question from {question.user_name}",
-                    f"You have a new question from {question.user_name} ({question.user_email}):\n\n"
-                    f"{question.question_text}\n\n"
-                    f"Login to the admin panel to assign it to a mentor: {request.build_absolute_uri(reverse('admin:index'))}",
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.ADMIN_EMAIL],
-                    fail_silently=False,
+            data = form.cleaned_data
+            screening = await sync_to_async(guard.screen)(
+                client_key(request), data['user_email'], data['question_text'], mentor.pk if mentor else None,
+            )
+            if screening.allowed:
+                # Email is sent later by `manage.py send_queued_email`, never in the request
+                await save_question(
+                    form, mentor, screening.content_hash, request.build_absolute_uri(reverse('admin:index')),
                 )
-            except:
-                pass  # Don't fail if email doesn't send
-            
-            messages.success(request, "Your question has been submitted! We'll get back to you soon.")
-            return redirect('question_submitted')
+            if not screening.retry_after:
+                # A resubmission looks exactly like the first, successful one
+                messages.success(request, "Your question has been submitted! We'll get back to you soon.")
+                return redirect('question_submitted')
+            form.add_error(None, "You have sent too many questions. Please try again later.")
+            status = 429
     else:
         form = QuestionForm()
     
     context = {
         'form': form,
         'mentor': mentor,
-        'mentors': Mentor.objects.filter(is_active=True) if not mentor else None,
+        'mentors': [m async for m in Mentor.objects.filter(is_active=True)] if not mentor else None,
     }
-    return render(request, 'mentors/ask_question.html', context)
+    response = render(request, 'mentors/ask_question.html', context, status=status)
+    if status == 429:
+        response.headers['Retry-After'] = str(screening.retry_after)
+    return response
+
+@cache_profile('static-pages')
+async def question_submitted(request):
+    return render(request, 'mentors/question_submitted.html')
+
+@never_cache
+async def mentor_answer(request, token):
+    """Where the link in the assignment email lands; the mentor answers without logging in"""
+    ids = read_answer_token(token)
+    if ids is None:
+        raise Http404("This link is invalid or has expired.")
+    question_id, mentor_id = ids
+    question = await Question.objects.select_related('mentor').filter(pk=question_id, mentor_id=mentor_id).afirst()
+    if question is None:
+        raise Http404("This question is no longer assigned to you.")
+
+    form = AnswerForm(request.POST if request.method == 'POST' else None)
+    if request.method == 'POST' and form.is_valid():
+        # Only a question still assigned to this mentor moves, so a replayed,
+        # stale or reassigned link does nothing
+        rows = Question.objects.filter(pk=question.pk, mentor_id=mentor_id)
+        if await sync_to_async(rows.transition)('answer', answer_text=form.cleaned_data['answer_text']):
+            return redirect('mentor_answer', token=token)
+        form.add_error(None, "This question has already been answered or was given to another mentor.")
+    return render(request, 'mentors/mentor_answer.html', {
+        'question': question,
+        'form': form,
+        'inbox_url': question.mentor.inbox_url(),
+    })
 
-def question_submitted(request):
-    return render(request, 'mentors/question_submitted.html')
\ No newline at end of file
+@never_cache
+async def mentor_inbox(request, token):
+    mentor_id = read_inbox_token(token)
+    mentor = mentor_id and await Mentor.objects.filter(pk=mentor_id, is_active=True).afirst()
+    if not mentor:
+        raise Http404("This link is invalid or has expired.")
+    # One query on question_mentor_status_idx
+    questions = [
+        question async for question in Question.objects.filter(mentor_id=mentor.pk, status='assigned')
+        .only('id', 'mentor_id', 'user_name', 'question_text', 'assigned_at', 'created_at')
+    ]
+    for question in questions:
+        question.answer_link = reverse('mentor_answer', args=[answer_token(question)])
+    return render(request, 'mentors/mentor_inbox.html', {'mentor': mentor, 'questions': questions})
@@ -1,7 +1,11 @@
-let mentors = [];
 const mentorsPerPage = 6;
 let currentPage = 1;
-let filteredMentors = [];
+let searchTerm = '';
+// cursors[i] is the cursor that loads page i + 1; page 1 has none
+let cursors = [null];
+let pageCache = new Map();
+let searchTimer = null;
+let requestId = 0;
 
 const mentorsContainer = document.getElementById('mentors-container');
 const paginationNumbers = document.getElementById('pagination-numbers');
@@ -9,24 +13,56 @@ const prevButton = document.getElementById('prev-btn');
 const nextButton = document.getElementById('next-btn');
 const searchInput = document.getElementById('search-input');
 
-async function fetchMentors() {
-    try {
-        const response = await fetch(window.location.href, {
-            headers: {
-                'X-Requested-With': 'XMLHttpRequest'
-            }
-        });
+// Resolves to null once a newer request has started: the answer belongs
+// to a search or page the user has moved on from and must not be kept
+async function fetchPage(page, thisRequest) {
+    if (pageCache.has(page)) {
+        return pageCache.get(page);
+    }
 
-        if (response.ok) {
-            const data = await response.json();
-            mentors = data.mentors;
-            filteredMentors = [...mentors];
-            displayMentors();
-            setupPagination();
-        } else {
-            throw new Error('Failed to fetch mentors');
+    const params = new URLSearchParams({ page_size: mentorsPerPage });
+    if (searchTerm) {
+        params.set('q', searchTerm);
+    }
+    const cursor = cursors[page - 1];
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+
+    const response = await fetch(`${window.location.pathname}?${params}`, {
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest'
         }
+    });
+    if (!response.ok) {
+        throw new Error('Failed to fetch mentors');
+    }
+
+    const data = await response.json();
+    if (thisRequest !== requestId) {
+        return null;
+    }
+    pageCache.set(page, data.mentors);
+    if (data.next_cursor) {
+        cursors[page] = data.next_cursor;
+    }
+    return data.mentors;
+}
+
+async function loadPage(page) {
+    const thisRequest = ++requestId;
+    try {
+        const pageMentors = await fetchPage(page, thisRequest);
+        if (pageMentors === null || thisRequest !== requestId) {
+            return;
+        }
+        currentPage = page;
+        displayMentors(pageMentors);
+        setupPagination();
     } catch (error) {
+        if (thisRequest !== requestId) {
+            return;
+        }
         console.error('Error fetching mentors:', error);
         mentorsContainer.innerHTML = `
             <div class="col-span-full text-center py-12">
@@ -38,14 +74,24 @@ async function fetchMentors() {
     }
 }
 
-function displayMentors() {
-    mentorsContainer.innerHTML = '';
+function hasNextPage() {
+    return cursors.length > currentPage;
+}
 
-    const startIndex = (currentPage - 1) * mentorsPerPage;
-    const endIndex = startIndex + mentorsPerPage;
-    const paginatedMentors = filteredMentors.slice(startIndex, endIndex);
+function photoMarkup(mentor) {
+    const photo = mentor.photo;
+    const sizes = '(min-width: 640px) 80px, 64px';
+    const size = photo.width ? `width="${photo.width}" height="${photo.height}"` : '';
+    const webp = photo.webp_srcset ?
+        `<source type="image/webp" srcset="${photo.webp_srcset}" sizes="${sizes}">` : '';
+    const srcset = photo.srcset ? `srcset="${photo.srcset}" sizes="${sizes}"` : '';
+    return `<picture>${webp}<img src="${photo.src}" ${srcset} ${size} alt="${mentor.name}" loading="lazy" decoding="async" class="w-16 h-16 sm:w-20 sm:h-20 rounded-full mx-auto mb-4 object-cover"></picture>`;
+}
+
+function displayMentors(pageMentors) {
+    mentorsContainer.innerHTML = '';
 
-    if (paginatedMentors.length === 0) {
+    if (pageMentors.length === 0) {
         mentorsContainer.innerHTML = `
             <div class="col-span-full text-center py-12">
                 <i class="fas fa-search text-4xl text-gray-400 mb-4"></i>
@@ -56,9 +102,9 @@ function displayMentors() {
         return;
     }
 
-    paginatedMentors.forEach(mentor => {
-        const profileImage = mentor.profile_photo_url ?
-            `<img src="${mentor.profile_photo_url}" alt="${mentor.name}" class="w-16 h-16 sm:w-20 sm:h-20 rounded-full mx-auto mb-4 object-cover">` :
+    pageMentors.forEach(mentor => {
+        const profileImage = mentor.photo ?
+            photoMarkup(mentor) :
             `<div class="w-16 h-16 sm:w-20 sm:h-20 bg-gradient-to-r ${mentor.gradient} rounded-full mx-auto mb-4 flex items-center justify-center text-white font-semibold text-lg sm:text-xl">${mentor.initials}</div>`;
 
         const mentorCard = `
@@ -82,19 +128,18 @@ function displayMentors() {
 }
 
 function setupPagination() {
-    const pageCount = Math.ceil(filteredMentors.length / mentorsPerPage);
+    // Only pages we hold a cursor for are reachable, so the page count
+    // grows as the user walks forward instead of coming from a COUNT query.
+    const pageCount = cursors.length;
     paginationNumbers.innerHTML = '';
 
+    prevButton.disabled = currentPage === 1;
+    nextButton.disabled = !hasNextPage();
+
     if (pageCount <= 1) {
-        prevButton.disabled = true;
-        nextButton.disabled = true;
         return;
     }
 
-    prevButton.disabled = currentPage === 1;
-
-    nextButton.disabled = currentPage === pageCount;
-
     let startPage = Math.max(1, currentPage - 1);
     let endPage = Math.min(pageCount, startPage + 2);
 
@@ -126,49 +171,36 @@ function setupPagination() {
         pageButton.addEventListener('click', () => goToPage(i));
         paginationNumbers.appendChild(pageButton);
     }
-
-    if (endPage < pageCount) {
-        if (endPage < pageCount - 1) {
-            const ellipsis = document.createElement('span');
-            ellipsis.textContent = '...';
-            ellipsis.className = 'text-white/60 px-2';
-            paginationNumbers.appendChild(ellipsis);
-        }
-
-        const pageButton = document.createElement('button');
-        pageButton.textContent = pageCount;
-        pageButton.className = 'pagination-btn px-3 py-2 sm:px-4 sm:py-2 rounded-xl text-sm font-medium focus-ring';
-        pageButton.addEventListener('click', () => goToPage(pageCount));
-        paginationNumbers.appendChild(pageButton);
-    }
 }
 
-function goToPage(page) {
-    currentPage = page;
-    displayMentors();
-    setupPagination();
+async function goToPage(page) {
+    if (page < 1 || page > cursors.length) {
+        return;
+    }
+    await loadPage(page);
     window.scrollTo({
         top: mentorsContainer.offsetTop - 100,
         behavior: 'smooth'
     });
 }
 
-function filterMentors() {
-    const searchTerm = searchInput.value.toLowerCase();
-
-    if (searchTerm === '') {
-        filteredMentors = [...mentors];
-    } else {
-        filteredMentors = mentors.filter(mentor =>
-            mentor.name.toLowerCase().includes(searchTerm) ||
-            mentor.university.toLowerCase().includes(searchTerm) ||
-            mentor.department.toLowerCase().includes(searchTerm)
-        );
-    }
-
+function resetPages() {
+    cursors = [null];
+    pageCache = new Map();
     currentPage = 1;
-    displayMentors();
-    setupPagination();
+}
+
+function filterMentors() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        const term = searchInput.value.trim();
+        if (term === searchTerm) {
+            return;
+        }
+        searchTerm = term;
+        resetPages();
+        loadPage(1);
+    }, 250);
 }
 
 function handleNavbarScroll() {
@@ -224,7 +256,7 @@ function setupMobileMenu() {
 document.addEventListener('DOMContentLoaded', function () {
     handleNavbarScroll();
 
-    fetchMentors();
+    loadPage(1);
 
     setupMobileMenu();
 